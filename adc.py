@@ -0,0 +1,161 @@
+import sys
+import time
+import math
+
+if sys.platform.startswith('linux'):
+    try:
+        import smbus2 as smbus
+    except ImportError:
+        smbus = None
+else:
+    smbus = None
+
+
+ADDRESS = 0x48
+CHANNEL = 0
+CONFIG_REG = 0x01
+CONVERSION_REG = 0x00
+GAIN = 1/2
+
+# Bits DR (7:5) del registro de configuracion para cada tasa de muestreo del ADS1115
+DATA_RATES = {8: 0b000, 16: 0b001, 32: 0b010, 64: 0b011, 128: 0b100, 250: 0b101, 475: 0b110, 860: 0b111}
+DATA_RATE = 860
+
+
+class ADS1115:
+    """Driver del ADS1115 que mantiene abierto el bus I2C y trabaja en modo de conversion continua.
+
+    El registro de configuracion se escribe una sola vez en start(); despues cada lectura
+    solo consulta el registro de conversion, espaciada segun la tasa de muestreo elegida.
+    """
+
+    def __init__(self, bus=None, address=ADDRESS, channel=CHANNEL, gain=GAIN, data_rate=DATA_RATE, bus_number=1):
+        if data_rate not in DATA_RATES:
+            raise ValueError(f"Tasa de muestreo no soportada por el ADS1115: {data_rate}")
+        if bus is None:
+            if smbus is None:
+                raise RuntimeError("smbus2 no esta disponible; use FakeBus para trabajar sin hardware")
+            bus = smbus.SMBus(bus_number)
+        self.bus = bus
+        self.address = address
+        self.channel = channel
+        self.gain = gain
+        self.data_rate = data_rate
+        self.sample_period = 1.0 / data_rate
+        self.scale = (2.048 / 32767) / gain
+        self.started = False
+        self._next_sample = 0.0
+
+    def config_word(self):
+        # MODE (bit 8) en 0 deja al ADC convirtiendo de forma continua
+        return (0b100 << 10) | (self.channel << 9) | (DATA_RATES[self.data_rate] << 5) | 0b100
+
+    def start(self):
+        config = self.config_word()
+        self.bus.write_i2c_block_data(self.address, CONFIG_REG, [(config >> 8) & 0xFF, config & 0xFF])
+        # Se espera la primera conversion antes de leer
+        time.sleep(2 * self.sample_period)
+        self._next_sample = time.perf_counter()
+        self.started = True
+
+    def read_raw(self, wait=True):
+        if not self.started:
+            self.start()
+        if wait:
+            delay = self._next_sample - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_sample = max(self._next_sample + self.sample_period, time.perf_counter())
+        data = self.bus.read_i2c_block_data(self.address, CONVERSION_REG, 2)
+        value = (data[0] << 8 | data[1]) & 0xFFFF
+        if value > 0x7FFF:
+            value -= 0x10000
+        return value
+
+    def read_block(self, raw_out, t_out):
+        # Lectura en rafaga: llena arreglos preasignados sin crear objetos por muestra
+        if not self.started:
+            self.start()
+        read = self.bus.read_i2c_block_data
+        clock = time.perf_counter
+        sleep = time.sleep
+        address = self.address
+        period = self.sample_period
+        next_sample = self._next_sample
+        for i in range(len(raw_out)):
+            delay = next_sample - clock()
+            if delay > 0:
+                sleep(delay)
+            now = clock()
+            next_sample = max(next_sample + period, now)
+            data = read(address, CONVERSION_REG, 2)
+            value = (data[0] << 8 | data[1]) & 0xFFFF
+            if value > 0x7FFF:
+                value -= 0x10000
+            raw_out[i] = value
+            t_out[i] = now
+        self._next_sample = next_sample
+        return raw_out, t_out
+
+    def to_voltage(self, raw):
+        return raw * self.scale
+
+    def read_voltage(self, wait=True):
+        return self.to_voltage(self.read_raw(wait))
+
+    def close(self):
+        self.started = False
+        close = getattr(self.bus, 'close', None)
+        if close is not None:
+            close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FakeBus:
+    """Bus I2C simulado para probar el driver sin el ADS1115 conectado.
+
+    Si no se entregan muestras se genera una senoidal de 60 Hz muestreada a la tasa
+    configurada en el registro de configuracion.
+    """
+
+    def __init__(self, samples=None, frequency=60, amplitude=20000):
+        self.samples = iter(samples) if samples is not None else None
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.registers = {CONFIG_REG: 0, CONVERSION_REG: 0}
+        self.config_writes = 0
+        self.reads = 0
+        self.closed = False
+
+    def write_i2c_block_data(self, address, register, data):
+        if self.closed:
+            raise OSError("Bus cerrado")
+        self.registers[register] = (data[0] << 8) | data[1]
+        if register == CONFIG_REG:
+            self.config_writes += 1
+
+    def _next_value(self):
+        if self.samples is not None:
+            return int(next(self.samples))
+        rate_bits = (self.registers[CONFIG_REG] >> 5) & 0b111
+        rate = next(r for r, bits in DATA_RATES.items() if bits == rate_bits)
+        return int(self.amplitude * math.sin(2 * math.pi * self.frequency * self.reads / rate))
+
+    def read_i2c_block_data(self, address, register, length):
+        if self.closed:
+            raise OSError("Bus cerrado")
+        if register == CONVERSION_REG:
+            value = self._next_value() & 0xFFFF
+            self.reads += 1
+            return [(value >> 8) & 0xFF, value & 0xFF]
+        value = self.registers[register]
+        return [(value >> 8) & 0xFF, value & 0xFF]
+
+    def close(self):
+        self.closed = True
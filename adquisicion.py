@@ -0,0 +1,130 @@
+import time
+import numpy as np
+
+
+class RingBuffer:
+    """Buffer circular preasignado de tiempos y cuentas crudas del ADC (u otros valores segun `dtype`).
+
+    Los datos se guardan dos veces (en i y en i + capacity) para que cualquier ventana
+    de hasta `capacity` muestras sea un slice contiguo y se pueda entregar sin copiar.
+    """
+
+    def __init__(self, capacity, dtype=np.int16):
+        self.capacity = capacity
+        self._t = np.zeros(2 * capacity, dtype=np.float64)
+        self._raw = np.zeros(2 * capacity, dtype=dtype)
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def write(self, t, raw):
+        n = len(t)
+        if n > self.capacity:
+            t = t[-self.capacity:]
+            raw = raw[-self.capacity:]
+            self.total += n - self.capacity
+            n = self.capacity
+        start = self.total % self.capacity
+        first = min(n, self.capacity - start)
+        for offset in (0, self.capacity):
+            self._t[offset + start:offset + start + first] = t[:first]
+            self._raw[offset + start:offset + start + first] = raw[:first]
+        if first < n:
+            rest = n - first
+            for offset in (0, self.capacity):
+                self._t[offset:offset + rest] = t[first:]
+                self._raw[offset:offset + rest] = raw[first:]
+        self.total += n
+
+    def latest(self, n=None):
+        # Vistas (sin copia) de las ultimas n muestras en orden cronologico
+        available = len(self)
+        n = available if n is None else min(n, available)
+        end = self.total % self.capacity
+        if end < n:
+            end += self.capacity
+        return self._t[end - n:end], self._raw[end - n:end]
+
+    def since(self, index, end=None):
+        # Vistas de las muestras con indice absoluto en [index, end) que sigan en el buffer;
+        # `end` fija el final aunque otro hilo siga escribiendo (por defecto, el total actual)
+        total = self.total
+        end = total if end is None else min(end, total)
+        start = max(index, total - len(self))
+        n = max(end - start, 0)
+        first = start % self.capacity
+        return self._t[first:first + n], self._raw[first:first + n]
+
+    def clear(self):
+        self.total = 0
+
+
+class AcquisitionEngine:
+    """Lee el ADC en bloques y los acumula en un RingBuffer.
+
+    Los tiempos se guardan en segundos desde start(). Las vistas devueltas por
+    read_block() y por el buffer apuntan a memoria que se sobreescribe en la
+    siguiente vuelta; quien necesite conservarlas debe copiarlas.
+    """
+
+    def __init__(self, adc, block_size=64, seconds=300):
+        self.adc = adc
+        self.block_size = block_size
+        self.buffer = RingBuffer(int(adc.data_rate * seconds))
+        self._t_block = np.empty(block_size, dtype=np.float64)
+        self._raw_block = np.empty(block_size, dtype=np.int16)
+        self.start_time = None
+
+    def start(self):
+        self.buffer.clear()
+        if not self.adc.started:
+            self.adc.start()
+        self.start_time = time.perf_counter()
+
+    def read_block(self):
+        if self.start_time is None:
+            self.start()
+        self.adc.read_block(self._raw_block, self._t_block)
+        self._t_block -= self.start_time
+        self.buffer.write(self._t_block, self._raw_block)
+        return self._t_block, self._raw_block
+
+    def latest(self, seconds=None):
+        # Tiempos y voltajes de los ultimos `seconds` segundos (los voltajes si son una copia)
+        n = None if seconds is None else int(seconds * self.adc.data_rate)
+        t, raw = self.buffer.latest(n)
+        return t, self.adc.to_voltage(raw)
+
+
+class BufferTail:
+    """Sigue el RingBuffer de un AcquisitionEngine que otro hilo esta llenando.
+
+    Cada read() copia solo las muestras nuevas desde la ultima lectura, les aplica la
+    transformacion afin `gain * cuentas + offset` y las agrega a una ventana propia de
+    `capacity` muestras; cuesta O(muestras nuevas).
+    """
+
+    def __init__(self, source, capacity, gain=1.0, offset=0.0):
+        self.source = source
+        self.gain = gain
+        self.offset = offset
+        self.buffer = RingBuffer(capacity, dtype=np.float64)
+        self.index = 0
+
+    def read(self):
+        total = self.source.total
+        if total < self.index:
+            # El buffer de origen se reinicio (nueva adquisicion)
+            self.buffer.clear()
+            self.index = 0
+        # Se copia hasta el total leido arriba: lo que el productor escriba mientras tanto queda para la proxima
+        t, raw = self.source.since(self.index, total)
+        count = len(t)
+        if count:
+            self.buffer.write(t, self.gain * raw + self.offset)
+        self.index = total
+        return count
+
+    def latest(self, n=None):
+        return self.buffer.latest(n)
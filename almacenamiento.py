@@ -0,0 +1,453 @@
+import io
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+import numpy as np
+from basedatos import transaction
+
+# Esquema de almacenamiento de adquisiciones:
+#   adquisiciones: una fila de metadatos por grabacion
+#   muestras: los datos en bloques de CHUNK_SIZE muestras, cada columna comprimida con zlib
+#             (tiempo float64, voltaje float32)
+#   eventos: perturbaciones detectadas en cada grabacion (ver eventos.py); adquisiciones.version_deteccion
+#             guarda con que deteccion se calcularon (NULL: aun no se calcularon)
+#   calibraciones: perfiles (m, b) por sensor; cada grabacion guarda el id del que se aplico
+#   sesiones / sesion_muestras: adquisiciones en curso, guardadas en bloques de SESSION_CHUNK_SIZE
+#             muestras a medida que se capturan; al finalizar pasan a adquisiciones / muestras
+#             y la sesion se borra, asi toda fila de sesiones es una sesion abierta
+CHUNK_SIZE = 65536
+# ~10 s a 860 SPS: es lo maximo que se pierde si el programa se cae durante una adquisicion
+SESSION_CHUNK_SIZE = 8192
+PAGE_SIZE = 50
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+METADATA_COLUMNS = ("id, fecha_guardado, fecha_inicio, duracion, num_muestras, tasa_muestreo, calibracion_m, "
+                    "calibracion_b, calibracion_id")
+
+Recording = namedtuple('Recording', ['id', 'fecha_guardado', 'fecha_inicio', 'duracion', 'num_muestras',
+                                     'tasa_muestreo', 'calibracion', 'calibracion_id', 't', 'v'])
+Calibration = namedtuple('Calibration', ['id', 'sensor', 'fecha', 'm', 'b'])
+Session = namedtuple('Session', ['id', 'fecha_inicio', 'tasa_muestreo', 'calibracion', 'calibracion_id',
+                                 'num_bloques', 'num_muestras'])
+
+
+def create_tables(connection):
+    cursor = connection.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS adquisiciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha_guardado TEXT NOT NULL,
+            fecha_inicio TEXT NOT NULL,
+            duracion REAL NOT NULL,
+            num_muestras INTEGER NOT NULL,
+            tasa_muestreo REAL,
+            calibracion_m REAL,
+            calibracion_b REAL,
+            calibracion_id INTEGER REFERENCES calibraciones(id),
+            version_deteccion TEXT
+        )
+    ''')
+    # Bases creadas antes de los perfiles de calibracion y del versionado de eventos
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(adquisiciones)")]
+    if 'calibracion_id' not in columns:
+        cursor.execute("ALTER TABLE adquisiciones ADD COLUMN calibracion_id INTEGER REFERENCES calibraciones(id)")
+    if 'version_deteccion' not in columns:
+        cursor.execute("ALTER TABLE adquisiciones ADD COLUMN version_deteccion TEXT")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS calibraciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sensor TEXT NOT NULL,
+            fecha TEXT NOT NULL,
+            m REAL NOT NULL,
+            b REAL NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_calibraciones_sensor ON calibraciones (sensor, id)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS muestras (
+            adquisicion_id INTEGER NOT NULL REFERENCES adquisiciones(id) ON DELETE CASCADE,
+            secuencia INTEGER NOT NULL,
+            num_muestras INTEGER NOT NULL,
+            tiempo BLOB NOT NULL,
+            voltaje BLOB NOT NULL,
+            PRIMARY KEY (adquisicion_id, secuencia)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_adquisiciones_fecha_inicio ON adquisiciones (fecha_inicio)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            adquisicion_id INTEGER NOT NULL REFERENCES adquisiciones(id) ON DELETE CASCADE,
+            tipo TEXT NOT NULL,
+            inicio REAL NOT NULL,
+            fin REAL NOT NULL,
+            duracion REAL NOT NULL,
+            magnitud_min REAL,
+            magnitud_max REAL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_eventos_adquisicion_inicio ON eventos (adquisicion_id, inicio)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sesiones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha_inicio TEXT NOT NULL,
+            tasa_muestreo REAL,
+            calibracion_m REAL,
+            calibracion_b REAL,
+            calibracion_id INTEGER REFERENCES calibraciones(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sesion_muestras (
+            sesion_id INTEGER NOT NULL REFERENCES sesiones(id) ON DELETE CASCADE,
+            secuencia INTEGER NOT NULL,
+            num_muestras INTEGER NOT NULL,
+            tiempo BLOB NOT NULL,
+            voltaje BLOB NOT NULL,
+            PRIMARY KEY (sesion_id, secuencia)
+        )
+    ''')
+    cursor.close()
+
+
+def needs_migration(connection):
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(adquisiciones)")]
+    return 'archivo_csv' in columns
+
+
+def parse_csv_text(csv_data):
+    # Filas "tiempo,voltaje"; las lineas vacias o incompletas se ignoran
+    datos = np.genfromtxt(io.StringIO(csv_data), delimiter=',', invalid_raise=False, ndmin=2)
+    if datos.size == 0:
+        return np.empty(0), np.empty(0)
+    datos = datos[~np.isnan(datos).any(axis=1)]
+    order = np.argsort(datos[:, 0], kind='stable')
+    return datos[order, 0], datos[order, 1]
+
+
+def estimate_sample_rate(t):
+    if len(t) < 2:
+        return None
+    step = np.median(np.diff(t))
+    return float(1.0 / step) if step > 0 else None
+
+
+def encode_chunk(t, v):
+    t = np.ascontiguousarray(t, dtype='<f8')
+    v = np.ascontiguousarray(v, dtype='<f4')
+    return zlib.compress(t.tobytes()), zlib.compress(v.tobytes())
+
+
+def decode_chunk(tiempo, voltaje):
+    return np.frombuffer(zlib.decompress(tiempo), dtype='<f8'), np.frombuffer(zlib.decompress(voltaje), dtype='<f4')
+
+
+def _insert_recording(connection, t, v, sample_rate, calibration, fecha_guardado, fecha_inicio, recording_id,
+                      chunk_size=CHUNK_SIZE, calibration_id=None):
+    fecha_guardado = fecha_guardado or datetime.now().strftime(DATE_FORMAT)
+    if fecha_inicio is None:
+        saved = datetime.strptime(fecha_guardado, DATE_FORMAT)
+        fecha_inicio = (saved - timedelta(seconds=float(t[-1]) if len(t) else 0.0)).strftime(DATE_FORMAT)
+    duracion = float(t[-1] - t[0]) if len(t) else 0.0
+    m, b = calibration if calibration is not None else (None, None)
+    cursor = connection.cursor()
+    cursor.execute(
+        "INSERT INTO adquisiciones (id, fecha_guardado, fecha_inicio, duracion, num_muestras, tasa_muestreo, "
+        "calibracion_m, calibracion_b, calibracion_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (recording_id, fecha_guardado, fecha_inicio, duracion, len(t), sample_rate, m, b, calibration_id))
+    recording_id = cursor.lastrowid
+    chunks = []
+    for seq, start in enumerate(range(0, len(t), chunk_size)):
+        t_chunk = t[start:start + chunk_size]
+        chunks.append((recording_id, seq, len(t_chunk), *encode_chunk(t_chunk, v[start:start + chunk_size])))
+    cursor.executemany(
+        "INSERT INTO muestras (adquisicion_id, secuencia, num_muestras, tiempo, voltaje) VALUES (?, ?, ?, ?, ?)", chunks)
+    cursor.close()
+    return recording_id
+
+
+def save_recording(connection, t, v, sample_rate=None, calibration=None, fecha_guardado=None, fecha_inicio=None,
+                   calibration_id=None):
+    """Guarda una grabacion (metadatos y bloques de muestras) en una sola transaccion y devuelve su id.
+
+    `calibration` es el (m, b) ya aplicado a `v` y `calibration_id` el perfil del que salio.
+    """
+    with transaction(connection):
+        return _insert_recording(connection, t, v, sample_rate, calibration, fecha_guardado, fecha_inicio, None,
+                                 calibration_id=calibration_id)
+
+
+def save_calibration(connection, sensor, m, b, fecha=None):
+    """Guarda un perfil de calibracion y devuelve su id; pasa a ser el vigente del sensor.
+
+    Los perfiles anteriores se conservan para las grabaciones que los referencian.
+    """
+    fecha = fecha or datetime.now().strftime(DATE_FORMAT)
+    with transaction(connection):
+        cursor = connection.execute("INSERT INTO calibraciones (sensor, fecha, m, b) VALUES (?, ?, ?, ?)",
+                                    (sensor, fecha, float(m), float(b)))
+    return cursor.lastrowid
+
+
+def load_calibration(connection, sensor):
+    # Perfil vigente (el ultimo guardado) del sensor, o None si no tiene
+    row = connection.execute("SELECT id, sensor, fecha, m, b FROM calibraciones WHERE sensor = ? "
+                             "ORDER BY id DESC LIMIT 1", (sensor,)).fetchone()
+    return Calibration(*row) if row else None
+
+
+def get_calibration(connection, calibration_id):
+    row = connection.execute("SELECT id, sensor, fecha, m, b FROM calibraciones WHERE id = ?",
+                             (calibration_id,)).fetchone()
+    return Calibration(*row) if row else None
+
+
+def open_session(connection, sample_rate=None, calibration=None, calibration_id=None, fecha_inicio=None):
+    # Registra una adquisicion en curso; sus bloques se agregan con append_session_chunk()
+    fecha_inicio = fecha_inicio or datetime.now().strftime(DATE_FORMAT)
+    m, b = calibration if calibration is not None else (None, None)
+    with transaction(connection):
+        cursor = connection.execute(
+            "INSERT INTO sesiones (fecha_inicio, tasa_muestreo, calibracion_m, calibracion_b, calibracion_id) "
+            "VALUES (?, ?, ?, ?, ?)", (fecha_inicio, sample_rate, m, b, calibration_id))
+    return cursor.lastrowid
+
+
+def append_session_chunk(connection, session_id, sequence, t, v):
+    """Guarda un bloque de la sesion en su propia transaccion.
+
+    Al volver de esta funcion el bloque ya esta confirmado en la base (WAL), asi una caida
+    posterior no lo pierde.
+    """
+    with transaction(connection):
+        connection.execute(
+            "INSERT INTO sesion_muestras (sesion_id, secuencia, num_muestras, tiempo, voltaje) VALUES (?, ?, ?, ?, ?)",
+            (session_id, sequence, len(t), *encode_chunk(t, v)))
+
+
+def _session(connection, row):
+    session_id, fecha_inicio, tasa_muestreo, m, b, calibration_id = row
+    blocks, samples = connection.execute(
+        "SELECT COUNT(*), COALESCE(SUM(num_muestras), 0) FROM sesion_muestras WHERE sesion_id = ?",
+        (session_id,)).fetchone()
+    return Session(session_id, fecha_inicio, tasa_muestreo, (m, b) if m is not None else None, calibration_id,
+                   blocks, samples)
+
+
+def get_session(connection, session_id):
+    row = connection.execute("SELECT id, fecha_inicio, tasa_muestreo, calibracion_m, calibracion_b, calibracion_id "
+                             "FROM sesiones WHERE id = ?", (session_id,)).fetchone()
+    return _session(connection, row) if row else None
+
+
+def open_sessions(connection):
+    # Sesiones que no se finalizaron (p. ej. porque el programa se cerro durante la adquisicion)
+    rows = connection.execute("SELECT id, fecha_inicio, tasa_muestreo, calibracion_m, calibracion_b, calibracion_id "
+                              "FROM sesiones ORDER BY id").fetchall()
+    return [_session(connection, row) for row in rows]
+
+
+def session_tail(connection, session_id):
+    # (siguiente numero de secuencia, tiempo de la ultima muestra) para reanudar una sesion
+    row = connection.execute("SELECT secuencia, tiempo FROM sesion_muestras WHERE sesion_id = ? "
+                             "ORDER BY secuencia DESC LIMIT 1", (session_id,)).fetchone()
+    if row is None:
+        return 0, None
+    t = np.frombuffer(zlib.decompress(row[1]), dtype='<f8')
+    return row[0] + 1, float(t[-1]) if len(t) else None
+
+
+def finalize_session(connection, session_id, fecha_guardado=None):
+    """Convierte una sesion en una adquisicion y devuelve su id (None si la sesion no tenia muestras).
+
+    Los bloques pasan tal cual de sesion_muestras a muestras, sin descomprimirlos; solo se leen
+    el primero y el ultimo para calcular la duracion. Todo ocurre en una transaccion.
+    """
+    session = get_session(connection, session_id)
+    if session is None:
+        return None
+    fecha_guardado = fecha_guardado or datetime.now().strftime(DATE_FORMAT)
+    with transaction(connection):
+        if not session.num_muestras:
+            connection.execute("DELETE FROM sesion_muestras WHERE sesion_id = ?", (session_id,))
+            connection.execute("DELETE FROM sesiones WHERE id = ?", (session_id,))
+            return None
+        first = connection.execute("SELECT tiempo FROM sesion_muestras WHERE sesion_id = ? ORDER BY secuencia "
+                                   "LIMIT 1", (session_id,)).fetchone()[0]
+        last = connection.execute("SELECT tiempo FROM sesion_muestras WHERE sesion_id = ? ORDER BY secuencia DESC "
+                                  "LIMIT 1", (session_id,)).fetchone()[0]
+        duracion = float(np.frombuffer(zlib.decompress(last), dtype='<f8')[-1]
+                         - np.frombuffer(zlib.decompress(first), dtype='<f8')[0])
+        m, b = session.calibracion if session.calibracion is not None else (None, None)
+        cursor = connection.execute(
+            "INSERT INTO adquisiciones (fecha_guardado, fecha_inicio, duracion, num_muestras, tasa_muestreo, "
+            "calibracion_m, calibracion_b, calibracion_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (fecha_guardado, session.fecha_inicio, duracion, session.num_muestras, session.tasa_muestreo, m, b,
+             session.calibracion_id))
+        recording_id = cursor.lastrowid
+        connection.execute(
+            "INSERT INTO muestras (adquisicion_id, secuencia, num_muestras, tiempo, voltaje) "
+            "SELECT ?, secuencia, num_muestras, tiempo, voltaje FROM sesion_muestras WHERE sesion_id = ?",
+            (recording_id, session_id))
+        connection.execute("DELETE FROM sesion_muestras WHERE sesion_id = ?", (session_id,))
+        connection.execute("DELETE FROM sesiones WHERE id = ?", (session_id,))
+    return recording_id
+
+
+def list_recordings(connection, after_id=None, limit=PAGE_SIZE):
+    # Solo metadatos, paginados por id (keyset) para no recorrer filas ya mostradas
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT id, fecha_guardado, duracion, num_muestras FROM adquisiciones WHERE id > ? ORDER BY id LIMIT ?",
+        (after_id if after_id is not None else -1, limit))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def load_samples(connection, recording_id):
+    cursor = connection.cursor()
+    cursor.execute("SELECT tiempo, voltaje FROM muestras WHERE adquisicion_id = ? ORDER BY secuencia", (recording_id,))
+    chunks = [decode_chunk(tiempo, voltaje) for tiempo, voltaje in cursor]
+    cursor.close()
+    if not chunks:
+        return np.empty(0), np.empty(0)
+    t = np.concatenate([c[0] for c in chunks])
+    v = np.concatenate([c[1] for c in chunks]).astype(np.float64)
+    return t, v
+
+
+def save_events(connection, recording_id, events, tipos=None, version=None):
+    """Reemplaza los eventos guardados de la grabacion (solo los de `tipos`, si se indica).
+
+    `version` (DetectionPipeline.version) queda registrada en la grabacion; ver events_version().
+    """
+    tipos = set(tipos) if tipos is not None else {event.tipo for event in events}
+    with transaction(connection):
+        connection.executemany("DELETE FROM eventos WHERE adquisicion_id = ? AND tipo = ?",
+                               [(recording_id, tipo) for tipo in tipos])
+        connection.executemany(
+            "INSERT INTO eventos (adquisicion_id, tipo, inicio, fin, duracion, magnitud_min, magnitud_max) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(recording_id, e.tipo, e.inicio, e.fin, e.duracion, e.magnitud_min, e.magnitud_max) for e in events])
+        if version is not None:
+            connection.execute("UPDATE adquisiciones SET version_deteccion = ? WHERE id = ?", (version, recording_id))
+
+
+def events_version(connection, recording_id):
+    # Version de deteccion de los eventos guardados, o None si no se calcularon
+    row = connection.execute("SELECT version_deteccion FROM adquisiciones WHERE id = ?", (recording_id,)).fetchone()
+    return row[0] if row else None
+
+
+def stale_recordings(connection, version):
+    # Ids de las grabaciones cuyos eventos no se calcularon con la deteccion `version`
+    rows = connection.execute("SELECT id FROM adquisiciones WHERE version_deteccion IS NOT ? ORDER BY id",
+                              (version,)).fetchall()
+    return [row[0] for row in rows]
+
+
+def invalidate_events(connection, version):
+    """Borra los eventos que no se calcularon con la deteccion `version`.
+
+    Las grabaciones afectadas quedan sin version (ver stale_recordings) hasta que se recalculan sus eventos.
+    Devuelve cuantas grabaciones tenian una version anterior.
+    """
+    stale = "SELECT id FROM adquisiciones WHERE version_deteccion IS NOT ?"
+    with transaction(connection):
+        connection.execute(f"DELETE FROM eventos WHERE adquisicion_id IN ({stale})", (version,))
+        cursor = connection.execute("UPDATE adquisiciones SET version_deteccion = NULL "
+                                    "WHERE version_deteccion IS NOT NULL AND version_deteccion IS NOT ?", (version,))
+    return cursor.rowcount
+
+
+def load_events(connection, recording_id, start=None, end=None):
+    query = ("SELECT tipo, inicio, fin, duracion, magnitud_min, magnitud_max FROM eventos "
+             "WHERE adquisicion_id = ? AND inicio >= ? AND inicio < ? ORDER BY inicio")
+    rows = connection.execute(query, (recording_id, start if start is not None else float('-inf'),
+                                      end if end is not None else float('inf'))).fetchall()
+    return rows
+
+
+def count_events(connection, recording_id=None):
+    # Cantidad de eventos por tipo, de una grabacion o de todas
+    if recording_id is None:
+        rows = connection.execute("SELECT tipo, COUNT(*) FROM eventos GROUP BY tipo").fetchall()
+    else:
+        rows = connection.execute(
+            "SELECT tipo, COUNT(*) FROM eventos WHERE adquisicion_id = ? GROUP BY tipo", (recording_id,)).fetchall()
+    return dict(rows)
+
+
+def delete_recordings(connection, recording_ids):
+    """Borra varias grabaciones en una transaccion. Los ids del resto no cambian."""
+    params = [(recording_id,) for recording_id in recording_ids]
+    with transaction(connection):
+        connection.executemany("DELETE FROM muestras WHERE adquisicion_id = ?", params)
+        connection.executemany("DELETE FROM eventos WHERE adquisicion_id = ?", params)
+        connection.executemany("DELETE FROM adquisiciones WHERE id = ?", params)
+
+
+class RecordingRepository:
+    """Acceso a las grabaciones por id sobre una conexion abierta."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def _metadata(self, row, t=None, v=None):
+        recording_id, fecha_guardado, fecha_inicio, duracion, num_muestras, tasa_muestreo, m, b, calibration_id = row
+        calibracion = (m, b) if m is not None else None
+        return Recording(recording_id, fecha_guardado, fecha_inicio, duracion, num_muestras, tasa_muestreo,
+                         calibracion, calibration_id, t, v)
+
+    def get_metadata(self, recording_id):
+        row = self.connection.execute(
+            f"SELECT {METADATA_COLUMNS} FROM adquisiciones WHERE id = ?", (recording_id,)).fetchone()
+        return self._metadata(row) if row else None
+
+    def get_recording(self, recording_id):
+        # Metadatos y muestras (t, v como arreglos de NumPy); None si el id no existe
+        recording = self.get_metadata(recording_id)
+        if recording is None:
+            return None
+        t, v = load_samples(self.connection, recording_id)
+        return recording._replace(t=t, v=v)
+
+    def list(self, after_id=None, limit=PAGE_SIZE):
+        return list_recordings(self.connection, after_id, limit)
+
+    def between(self, start, end):
+        # Metadatos de las grabaciones que comenzaron en [start, end); usa el indice de fecha_inicio
+        start = start.strftime(DATE_FORMAT) if isinstance(start, datetime) else start
+        end = end.strftime(DATE_FORMAT) if isinstance(end, datetime) else end
+        rows = self.connection.execute(
+            f"SELECT {METADATA_COLUMNS} FROM adquisiciones WHERE fecha_inicio >= ? AND fecha_inicio < ? "
+            "ORDER BY fecha_inicio", (start, end)).fetchall()
+        return [self._metadata(row) for row in rows]
+
+    def save(self, t, v, sample_rate=None, calibration=None, calibration_id=None):
+        return save_recording(self.connection, t, v, sample_rate, calibration, calibration_id=calibration_id)
+
+    def delete(self, recording_ids):
+        delete_recordings(self.connection, recording_ids)
+
+
+def migrate(connection):
+    """Convierte el esquema anterior (CSV completo en adquisiciones.archivo_csv) al de metadatos + bloques.
+
+    Se conservan los ids y las fechas de guardado. Todo ocurre en una transaccion: si algo falla
+    la base queda como estaba.
+    """
+    if not needs_migration(connection):
+        create_tables(connection)
+        return 0
+    count = 0
+    with transaction(connection):
+        connection.execute("ALTER TABLE adquisiciones RENAME TO adquisiciones_csv")
+        create_tables(connection)
+        old = connection.execute("SELECT id, archivo_csv, fecha_guardado FROM adquisiciones_csv ORDER BY id").fetchall()
+        for recording_id, csv_data, fecha_guardado in old:
+            t, v = parse_csv_text(csv_data)
+            _insert_recording(connection, t, v, estimate_sample_rate(t), None, fecha_guardado, None, recording_id)
+            count += 1
+        connection.execute("DROP TABLE adquisiciones_csv")
+    return count
@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = 'registros.db'
+
+# WAL permite que el hilo de la interfaz lea mientras otro hilo escribe una adquisicion
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+)
+
+_local = threading.local()
+_connections = []
+_lock = threading.Lock()
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=5.0)
+    for pragma in PRAGMAS:
+        connection.execute(pragma)
+    return connection
+
+
+def create_sqlite_connection(path=DB_PATH):
+    """Devuelve la conexion del hilo actual a la base, creandola la primera vez.
+
+    La conexion se comparte entre todas las llamadas del mismo hilo, por lo que quien la
+    usa no debe cerrarla; para eso estan close_connection() y close_all().
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    connection = connections.get(path)
+    if connection is None:
+        try:
+            connection = _connect(path)
+        except sqlite3.Error as e:
+            print(f"Error: {e}")
+            return None
+        connections[path] = connection
+        with _lock:
+            _connections.append(connection)
+    return connection
+
+
+@contextmanager
+def transaction(connection=None, path=DB_PATH):
+    # Agrupa varias escrituras en una transaccion (BEGIN IMMEDIATE toma el bloqueo de escritura al inicio);
+    # sin `connection` usa la del hilo actual
+    if connection is None:
+        connection = create_sqlite_connection(path)
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    else:
+        connection.execute("COMMIT")
+
+
+def close_connection(path=DB_PATH):
+    connections = getattr(_local, 'connections', {})
+    connection = connections.pop(path, None)
+    if connection is not None:
+        with _lock:
+            if connection in _connections:
+                _connections.remove(connection)
+        connection.close()
+
+
+def close_all():
+    _local.connections = {}
+    with _lock:
+        connections = list(_connections)
+        _connections.clear()
+    for connection in connections:
+        try:
+            connection.close()
+        except sqlite3.Error:
+            # Conexiones de otros hilos: sqlite3 solo permite cerrarlas desde su hilo
+            pass
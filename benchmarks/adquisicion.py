@@ -0,0 +1,106 @@
+#Comprueba que BufferTail no pierda ni repita muestras cuando el productor escribe durante read(),
+#que SessionWriter espere (sin descartar bloques) cuando la base va atrasada y que un fallo del
+#escritor llegue a put(); mide ademas el costo de read() por bloque
+#Uso: python -m benchmarks.adquisicion [num_bloques]
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import almacenamiento
+import basedatos
+from adquisicion import BufferTail, RingBuffer
+from escritura import SessionWriter
+
+BLOCK = 64
+
+
+class RacingBuffer(RingBuffer):
+    # Simula al hilo de adquisicion escribiendo un bloque entre la lectura de `total` y la copia
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self.next = 0
+
+    def produce(self, n=BLOCK):
+        values = np.arange(self.next, self.next + n)
+        self.write(values.astype(np.float64), values.astype(np.int16))
+        self.next += n
+
+    def since(self, index, end=None):
+        self.produce()
+        return super().since(index, end)
+
+
+def check_tail_race(blocks=200):
+    source = RacingBuffer(4 * BLOCK)
+    tail = BufferTail(source, capacity=blocks * BLOCK)
+    source.produce()
+    for _ in range(blocks):
+        tail.read()
+    t, _ = tail.latest()
+    assert np.array_equal(t, np.arange(tail.index)), "BufferTail repitio o salto muestras"
+
+
+class SlowWriter(SessionWriter):
+    def _commit(self):
+        time.sleep(0.01)
+        super()._commit()
+
+
+class FailingWriter(SessionWriter):
+    def _commit(self):
+        raise OSError("disco lleno")
+
+
+def check_writer(path, blocks=200):
+    connection = basedatos.create_sqlite_connection(path)
+    almacenamiento.create_tables(connection)
+    session_id = almacenamiento.open_session(connection, 860.0)
+    writer = SlowWriter(session_id, db_path=path, chunk_size=BLOCK, queue_size=2).start()
+    for start in range(0, blocks * BLOCK, BLOCK):
+        t = np.arange(start, start + BLOCK, dtype=np.float64)
+        assert writer.put(np.column_stack((t, t)))
+    writer.stop()
+    assert writer.queued == writer.written == blocks * BLOCK, "SessionWriter descarto bloques"
+    assert almacenamiento.session_tail(connection, session_id)[0] == blocks
+
+    writer = FailingWriter(session_id, db_path=path, chunk_size=BLOCK, queue_size=2).start()
+    rows = np.zeros((BLOCK, 2))
+    try:
+        for _ in range(blocks):
+            writer.put(rows)
+    except RuntimeError as e:
+        assert isinstance(e.__cause__, OSError)
+    else:
+        raise AssertionError("put() no informo el error del hilo de escritura")
+    try:
+        writer.stop()
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("stop() no informo el error del hilo de escritura")
+
+
+def main(blocks=100_000):
+    blocks = int(blocks)
+    check_tail_race()
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            check_writer(os.path.join(directory, 'prueba.db'))
+        finally:
+            basedatos.close_all()
+    print("BufferTail y SessionWriter: comprobaciones superadas")
+
+    source = RingBuffer(16 * BLOCK)
+    tail = BufferTail(source, capacity=10 * 860, gain=0.000125, offset=0.1)
+    values = np.arange(BLOCK)
+    start = time.perf_counter()
+    for _ in range(blocks):
+        source.write(values.astype(np.float64), values.astype(np.int16))
+        tail.read()
+    elapsed = time.perf_counter() - start
+    print(f"read() con bloques de {BLOCK}: {elapsed / blocks * 1e6:.2f} us por bloque")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
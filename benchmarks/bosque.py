@@ -0,0 +1,36 @@
+#Compara predict de scikit-learn con el bosque compilado de bosque.py en lotes pequenos
+#Uso: python -m benchmarks.bosque [modelo.joblib]
+import sys
+import time
+import numpy as np
+from joblib import load
+from bosque import FlatForest
+
+
+def timed(function, X, repeat=50):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(X)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(path='Modelos_RandomForest/modelo_random_forest_swell.joblib'):
+    model = load(path)
+    forest = FlatForest.from_sklearn(model)
+    rng = np.random.default_rng(0)
+    X = rng.normal(200, 120, (20000, model.n_features_in_))
+    assert np.array_equal(forest.predict(X), model.predict(X)), "Las predicciones no coinciden"
+    assert np.array_equal(forest.predict_proba(X), model.predict_proba(X)), "Las probabilidades no coinciden"
+
+    print(f"{path}: {len(forest.roots)} arboles, {len(forest.feature)} nodos, profundidad {forest.depth}")
+    for n in (1, 10, 40, 200, 1000):
+        sklearn_time = timed(model.predict, X[:n])
+        flat_time = timed(forest.predict, X[:n])
+        print(f"{n:5d} filas  scikit-learn {sklearn_time * 1e6:9.0f} us   plano {flat_time * 1e6:9.0f} us"
+              f"  ({sklearn_time / flat_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,49 @@
+#Compara tres bosques binarios (swell, sag, armonico) contra el bosque multiclase de clasificacion.py
+#Uso: python -m benchmarks.clasificacion
+import time
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from clasificacion import CLASSES, DisturbanceClassifier, synthetic_signal, train_multiclass
+
+
+def timed(function, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    t, v, v_combined, labels = synthetic_signal()
+    X = np.column_stack((v, v_combined))
+
+    binary_models = {}
+    for name in CLASSES[1:]:
+        model = RandomForestClassifier(random_state=42)
+        model.fit(X, labels == CLASSES.index(name))
+        binary_models[name] = model
+    combined = DisturbanceClassifier(train_multiclass(X, labels))
+
+    def three_models(X):
+        return {name: model.predict(X) == 1 for name, model in binary_models.items()}
+
+    # Mismo ancho de ventana que la animacion de modelosFVFinal.py (0.04 s)
+    frame = X[(t >= 5.0) & (t <= 5.04)]
+    for label, data in (("Senal completa", X), ("Ventana de animacion", frame)):
+        separate = timed(lambda: three_models(data), repeat=5 if len(data) > 1000 else 20)
+        single = timed(lambda: combined.detect(data), repeat=5 if len(data) > 1000 else 20)
+        print(f"{label} ({len(data)} muestras)")
+        print(f"  Tres modelos:   {separate * 1000:8.2f} ms")
+        print(f"  Multiclase:     {single * 1000:8.2f} ms  ({separate / single:.1f}x)")
+
+    masks = combined.detect(X)[2]
+    reference = three_models(X)
+    for name in CLASSES[1:]:
+        agreement = np.mean(masks[name] == reference[name])
+        print(f"Coincidencia {name}: {agreement:.4f}")
+
+
+if __name__ == '__main__':
+    main()
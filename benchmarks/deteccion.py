@@ -0,0 +1,67 @@
+#Reproduce adquisiciones por bloques con OnlineDetector, comprueba que da los mismos eventos que
+#DetectionPipeline sobre la senal completa y mide el tiempo por bloque
+#Uso: python -m benchmarks.deteccion [segundos]
+import sys
+import time
+import numpy as np
+import pandas as pd
+from almacenamiento import estimate_sample_rate
+from deteccion import VOLTAGE_NOMINAL, DetectionPipeline, OnlineDetector
+
+CHUNK_SIZES = (1, 7, 64, 1000)
+
+
+def synthetic(seconds, rate=860):
+    # Senal en la escala del modelo de swell, con tramos de amplitud mayor y huecos entre picos
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * rate)) / rate
+    amplitude = np.repeat(rng.choice([0.3, 0.5], size=len(t) // 200 + 1), 200)[:len(t)]
+    v = 1.2 + amplitude * np.sin(2 * np.pi * 60 * t) + rng.normal(0, 0.02, len(t))
+    return t, v, rate
+
+
+def nominal(seconds, rate=860):
+    # Red de VOLTAGE_NOMINAL voltios eficaces con un swell de 1.2 veces durante un segundo
+    t = np.arange(int(seconds * rate)) / rate
+    amplitude = np.where((t >= seconds / 2) & (t < seconds / 2 + 1), 1.2, 1.0)
+    v = VOLTAGE_NOMINAL * np.sqrt(2) * amplitude * np.sin(2 * np.pi * 60 * t)
+    return t, v, rate
+
+
+def example(path='data/adc_datsa.csv'):
+    datos = pd.read_csv(path, header=None, names=['tiempo', 'voltaje']).astype(float)
+    t, v = datos['tiempo'].values, datos['voltaje'].values
+    return t, v, estimate_sample_rate(t)
+
+
+def replay(t, v, rate, chunk_size, voltage_nominal):
+    detector = OnlineDetector(rate, voltage_nominal=voltage_nominal)
+    events = []
+    times = []
+    for start in range(0, len(v), chunk_size):
+        begin = time.perf_counter()
+        events.extend(detector.push(t[start:start + chunk_size], v[start:start + chunk_size]))
+        times.append(time.perf_counter() - begin)
+    events.extend(detector.flush())
+    return events, np.array(times)
+
+
+def check(name, t, v, rate, voltage_nominal, min_events=0):
+    expected = DetectionPipeline(voltage_nominal=voltage_nominal, cache_size=0).compute(t, v, rate).events
+    print(f"{name}: {len(v)} muestras a {rate:.1f} muestras/s, {len(expected)} eventos")
+    assert len(expected) >= min_events, f"{name}: se esperaban al menos {min_events} eventos"
+    for chunk_size in CHUNK_SIZES + (len(v),):
+        events, times = replay(t, v, rate, chunk_size, voltage_nominal)
+        assert events == expected, f"{name}: los eventos por bloques de {chunk_size} no coinciden"
+        print(f"  bloques de {chunk_size:>6}: {times.mean() * 1000:8.3f} ms por bloque, maximo {times.max() * 1000:.3f} ms")
+
+
+def main(seconds=60):
+    check('sintetica', *synthetic(float(seconds)), voltage_nominal=1.12)
+    # Con la tension nominal por defecto el bosque y el Urms(1/2) deben coincidir en escala
+    check('nominal', *nominal(float(seconds)), voltage_nominal=VOLTAGE_NOMINAL, min_events=1)
+    check('ejemplo', *example(), voltage_nominal=1.0)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
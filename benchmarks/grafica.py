@@ -0,0 +1,63 @@
+#Tiempo por cuadro de la grafica de una adquisicion larga: redibujo completo contra ScrollingPlot
+#con la piramide min/max de grafica.py
+#Uso: python -m benchmarks.grafica [horas]
+import sys
+import time
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+from grafica import EnvelopePyramid, ScrollingPlot
+
+
+def full_redraw(t, v, mask, frames=5):
+    fig, ax = plt.subplots()
+    start = time.perf_counter()
+    for frame in range(frames):
+        ax.clear()
+        ax.set_xlim(frame, frame + 10)
+        ax.plot(t, v, 'r')
+        ax.plot(t[mask], v[mask], 'go')
+        fig.canvas.draw()
+    plt.close(fig)
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def scrolling(t, v, mask, frames=50):
+    start = time.perf_counter()
+    pyramid = EnvelopePyramid(t, v, mask)
+    build = time.perf_counter() - start
+    fig, ax = plt.subplots()
+
+    def update(frame):
+        window_start = float(frame)
+        t_window, low, high, t_marks, v_marks = pyramid.window(window_start, window_start + plot.window, plot.pixels)
+        plot.set_trace(signal, t_window, low, high, window_start)
+        plot.set_line(marks, t_marks, v_marks, window_start)
+        return window_start
+
+    plot = ScrollingPlot(fig, ax, update)
+    signal = plot.add_trace('r')
+    marks = plot.add_line('go')
+    plot.fit_y(v)
+    fig.canvas.draw()
+    for _ in range(frames):
+        plot._tick()
+    plt.close(fig)
+    return build, pyramid, plot.timer
+
+
+def main(hours=1.0):
+    n = int(860 * 3600 * float(hours))
+    t = np.arange(n) / 860
+    v = 220 * np.sqrt(2) * np.sin(2 * np.pi * 60 * t) + np.random.default_rng(0).normal(0, 5, n)
+    mask = v > 1.1 * 220 * np.sqrt(2)
+    print(f"{n} muestras ({hours} h a 860 SPS)")
+    print(f"redibujo completo: {full_redraw(t, v, mask):.1f} ms por cuadro")
+    build, pyramid, timer = scrolling(t, v, mask)
+    print(f"piramide: {len(pyramid.levels)} niveles, {pyramid.nbytes / 1e6:.1f} MB, {build * 1000:.0f} ms")
+    print(f"ScrollingPlot: {timer.report()}")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,61 @@
+#Compara el detector de picos vectorizado con el ciclo de Python que usaba interfaz.py
+#Uso: python -m benchmarks.picos [num_muestras]
+import sys
+import time
+import numpy as np
+from scipy.signal import find_peaks
+from deteccion import detect_ascent_peaks
+
+
+def detect_ascent_peaks_loop(voltage_series):
+    ascent_peaks = np.zeros_like(voltage_series, dtype=bool)
+    for i in range(1, len(voltage_series) - 1):
+        if voltage_series[i - 1] < voltage_series[i] and voltage_series[i] > voltage_series[i + 1]:
+            ascent_peaks[i] = True
+    return ascent_peaks
+
+
+def check_find_peaks(signals=500, n=400):
+    # Las opciones replican las de scipy.signal.find_peaks, tambien combinadas
+    rng = np.random.default_rng(1)
+    for _ in range(signals):
+        v = rng.normal(0, 1, n).cumsum() + rng.normal(0, 1, n)
+        prominence, distance = rng.uniform(0.5, 5), int(rng.integers(2, 30))
+        for kwargs in ({'prominence': prominence}, {'distance': distance},
+                       {'prominence': prominence, 'distance': distance}):
+            expected = np.zeros(n, dtype=bool)
+            expected[find_peaks(v, **kwargs)[0]] = True
+            assert np.array_equal(detect_ascent_peaks(v, **kwargs), expected), f"Difiere de find_peaks con {kwargs}"
+
+
+def timed(function, *args, repeat=3, **kwargs):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(n=1_000_000):
+    rng = np.random.default_rng(0)
+    t = np.arange(n) / 860
+    v = 311 * np.sin(2 * np.pi * 60 * t) + rng.normal(0, 2, n)
+
+    loop_time, loop_result = timed(detect_ascent_peaks_loop, v, repeat=1)
+    vector_time, vector_result = timed(detect_ascent_peaks, v)
+    assert np.array_equal(loop_result, vector_result), "El detector vectorizado no coincide con el ciclo"
+    check_find_peaks()
+
+    print(f"Muestras: {n}  picos: {np.count_nonzero(vector_result)}")
+    print(f"Ciclo de Python:        {loop_time * 1000:10.1f} ms")
+    print(f"Vectorizado:            {vector_time * 1000:10.1f} ms  ({loop_time / vector_time:.0f}x)")
+    for label, kwargs in (("Con mesetas", {'plateaus': True}),
+                          ("Prominencia >= 50 V", {'prominence': 50}),
+                          ("Distancia >= 10", {'distance': 10})):
+        elapsed, result = timed(detect_ascent_peaks, v, **kwargs)
+        print(f"{label + ':':<24}{elapsed * 1000:10.1f} ms  picos: {np.count_nonzero(result)}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
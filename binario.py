@@ -0,0 +1,73 @@
+import csv
+import os
+import struct
+import numpy as np
+
+# Formato binario para exportar adquisiciones y analizarlas con np.memmap (open_recording):
+#   cabecera fija de 64 bytes (magic, version, tasa de muestreo, calibracion m y b)
+#   seguida de registros de 12 bytes: tiempo float64 + voltaje float32 (little endian)
+MAGIC = b'ADCV'
+VERSION = 1
+HEADER = struct.Struct('<4sH2xddd')
+HEADER_SIZE = 64
+RECORD_DTYPE = np.dtype([('tiempo', '<f8'), ('voltaje', '<f4')])
+
+
+def write_header(file, sample_rate, calibration=(1.0, 0.0)):
+    m, b = calibration
+    header = HEADER.pack(MAGIC, VERSION, float(sample_rate), float(m), float(b))
+    file.write(header.ljust(HEADER_SIZE, b'\0'))
+
+
+def read_header(path):
+    with open(path, 'rb') as file:
+        data = file.read(HEADER_SIZE)
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"{path} no tiene cabecera de adquisicion")
+    magic, version, sample_rate, m, b = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} no es un archivo de adquisicion binario")
+    if version != VERSION:
+        raise ValueError(f"Version de formato no soportada: {version}")
+    return {'sample_rate': sample_rate, 'calibration': (m, b)}
+
+
+def _records(t, v):
+    records = np.empty(len(t), dtype=RECORD_DTYPE)
+    records['tiempo'] = t
+    records['voltaje'] = v
+    return records
+
+
+def open_recording(path):
+    """Devuelve (cabecera, registros) con los registros mapeados en memoria de solo lectura."""
+    header = read_header(path)
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return header, np.empty(0, dtype=RECORD_DTYPE)
+    records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+    return header, records
+
+
+def calibrated(path):
+    # Tiempos y voltajes con la calibracion de la cabecera aplicada
+    header, records = open_recording(path)
+    m, b = header['calibration']
+    if (m, b) == (1.0, 0.0):
+        # Muestras calibradas durante la adquisicion: no hace falta otra pasada
+        return records['tiempo'], records['voltaje']
+    return records['tiempo'], m * records['voltaje'].astype(np.float64) + b
+
+
+def export_binary(path, t, v, sample_rate=None):
+    # Archivo nuevo (reemplaza el que hubiera) con una adquisicion cuyos voltajes ya estan calibrados
+    with open(path, 'wb') as file:
+        write_header(file, sample_rate or 0.0)
+        file.write(_records(t, v).tobytes())
+
+
+def export_csv(path, t, v):
+    # Filas "tiempo,voltaje" sin encabezado, el formato que leen lote.py y DetectionPipeline.run_csv
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerows(zip(t.tolist(), v.tolist()))
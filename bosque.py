@@ -0,0 +1,135 @@
+#Compila un RandomForestClassifier de scikit-learn a arreglos planos y lo evalua con NumPy
+#Uso: python bosque.py modelo.joblib [salida.npz]
+import sys
+import numpy as np
+
+LEAF = -1
+# Hasta este numero de filas FlatForest es mas rapido que scikit-learn; con lotes grandes
+# conviene el predict de scikit-learn, que recorre los arboles en codigo compilado
+SMALL_BATCH = 512
+
+
+class FlatForest:
+    """Bosque de clasificacion guardado como arreglos contiguos de nodos.
+
+    Todos los arboles comparten los mismos arreglos (feature, threshold, left, right, value);
+    `roots` indica el nodo raiz de cada arbol. En las hojas left y right apuntan a la propia
+    hoja y el umbral es +inf, asi el recorrido avanza todas las filas y arboles a la vez sin
+    distinguir hojas; cada pocos pasos se descartan los caminos que ya terminaron. Las
+    predicciones son las mismas que las de predict/predict_proba de scikit-learn.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth, classes, n_features=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.classes_ = classes
+        # Sin el dato del modelo original se deduce de los nodos, aunque puede faltar la ultima columna
+        if n_features is None:
+            n_features = int(feature.max()) + 1 if len(feature) else 0
+        self.n_features_in_ = int(n_features)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        estimators = getattr(model, 'estimators_', [model])
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Solo se soportan bosques de clasificacion de una salida")
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            n = tree.node_count
+            leaf = tree.children_left == LEAF
+            left = np.where(leaf, np.arange(n), tree.children_left) + offset
+            right = np.where(leaf, np.arange(n), tree.children_right) + offset
+            value = tree.value[:, 0, :].astype(np.float64)
+            # Igual que DecisionTreeClassifier.predict_proba: cada hoja normalizada a suma 1
+            totals = value.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            lefts.append(left)
+            rights.append(right)
+            values.append(value / totals)
+            roots.append(offset)
+            offset += n
+            depth = max(depth, tree.max_depth)
+        return cls(np.concatenate(features).astype(np.int32),
+                   np.concatenate(thresholds).astype(np.float64),
+                   np.concatenate(lefts).astype(np.int32),
+                   np.concatenate(rights).astype(np.int32),
+                   np.concatenate(values),
+                   np.asarray(roots, dtype=np.int32),
+                   depth,
+                   np.asarray(model.classes_),
+                   getattr(model, 'n_features_in_', None))
+
+    def leaves(self, X):
+        # scikit-learn compara en float32, por eso X se convierte antes de recorrer
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n_rows, n_features = X.shape
+        X = X.ravel()
+        n_trees = len(self.roots)
+        # Un camino por cada par (fila, arbol); solo se avanzan los que aun no llegan a una hoja
+        node = np.tile(self.roots, n_rows).astype(np.intp)
+        base = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, n_trees)
+        active = np.arange(len(node))
+        for step in range(self.depth):
+            current = node[active]
+            go_left = X[base[active] + self.feature[current]] <= self.threshold[current]
+            node[active] = np.where(go_left, self.left[current], self.right[current])
+            if step % 4 == 3:
+                current = node[active]
+                active = active[self.left[current] != current]
+                if not len(active):
+                    break
+        return node.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X):
+        values = self.value[self.leaves(X)]
+        # cumsum suma arbol por arbol en el mismo orden que RandomForestClassifier
+        proba = np.cumsum(values, axis=1)[:, -1, :]
+        proba /= values.shape[1]
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(self.predict_proba(X).argmax(axis=1))
+
+    def save(self, path):
+        np.savez(path, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+                 value=self.value, roots=self.roots, depth=self.depth, classes=self.classes_,
+                 n_features=self.n_features_in_)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['feature'], data['threshold'], data['left'], data['right'], data['value'],
+                       data['roots'], data['depth'], data['classes'],
+                       data['n_features'] if 'n_features' in data.files else None)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.value, self.roots))
+
+
+def compile_model(path, output=None):
+    from joblib import load
+    forest = FlatForest.from_sklearn(load(path))
+    if output is None:
+        output = path.rsplit('.', 1)[0] + '.npz'
+    forest.save(output)
+    return output, forest
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Uso: python bosque.py modelo.joblib [salida.npz]")
+        sys.exit(1)
+    output, forest = compile_model(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"{output}: {len(forest.roots)} arboles, {len(forest.feature)} nodos, "
+          f"profundidad {forest.depth}, {forest.nbytes / 1024:.1f} KiB")
@@ -0,0 +1,127 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+FREQUENCY = 60
+N_HARMONICS = 7
+# Diferencia maxima (en muestras) entre el largo ideal de la ventana y el redondeado para
+# considerar que la ventana abarca un numero entero de periodos
+WHOLE_PERIOD_TOLERANCE = 0.05
+
+
+def window_length(sample_rate, frequency=FREQUENCY, cycles=1.0):
+    return max(int(round(sample_rate * cycles / frequency)), 2)
+
+
+def whole_cycles(sample_rate, frequency=FREQUENCY, cycles=1):
+    """True si una ventana de `cycles` ciclos sirve para medir armonicos.
+
+    Hace falta un numero entero de ciclos (el armonico h cae en el bin h * cycles de la FFT)
+    y un numero entero de muestras por ventana; si no, la energia se reparte entre bins vecinos.
+    """
+    length = sample_rate * cycles / frequency
+    return float(cycles).is_integer() and cycles >= 1 and abs(length - round(length)) <= WHOLE_PERIOD_TOLERANCE
+
+
+def harmonic_cycles(sample_rate, frequency=FREQUENCY, max_cycles=12):
+    # Menor cantidad de ciclos que cumple whole_cycles(), p. ej. 3 a 860 SPS (43 muestras)
+    for cycles in range(1, max_cycles + 1):
+        if whole_cycles(sample_rate, frequency, cycles):
+            return cycles
+    raise ValueError(f"Ninguna ventana de hasta {max_cycles} ciclos tiene un numero entero de muestras "
+                     f"a {sample_rate} muestras/s")
+
+
+def _check_cycles(sample_rate, frequency, cycles, n_harmonics):
+    if n_harmonics and not whole_cycles(sample_rate, frequency, cycles):
+        raise ValueError(f"Una ventana de {cycles} ciclos a {sample_rate} muestras/s no contiene armonicos enteros; "
+                         "use harmonic_cycles() o n_harmonics=0")
+
+
+def feature_names(n_harmonics=N_HARMONICS):
+    return ['rms', 'pico', 'factor_cresta'] + [f'armonico_{h}' for h in range(1, n_harmonics + 1)] + ['thd']
+
+
+def frame_signal(v, window, hop=None):
+    # Vista (sin copia) de ventanas de `window` muestras que avanzan `hop` muestras
+    hop = hop or window
+    v = np.asarray(v, dtype=np.float64)
+    if len(v) < window:
+        return np.empty((0, window))
+    return sliding_window_view(v, window)[::hop]
+
+
+def window_features(frames, n_harmonics=N_HARMONICS, cycles=1):
+    """Caracteristicas por ventana: RMS, pico, factor de cresta, energia de cada armonico y THD.
+
+    Cada ventana abarca `cycles` ciclos, asi el armonico h esta en el bin h * cycles de la FFT;
+    con armonicos `cycles` debe ser entero (ver whole_cycles). Los armonicos por encima de
+    Nyquist quedan en 0. Devuelve un arreglo (n_ventanas, 4 + n_harmonics) con las columnas
+    de feature_names().
+    """
+    if n_harmonics and not float(cycles).is_integer():
+        raise ValueError(f"Los armonicos necesitan ventanas de un numero entero de ciclos, no {cycles}")
+    window = frames.shape[1]
+    rms = np.sqrt(np.einsum('ij,ij->i', frames, frames) / window)
+    peak = np.abs(frames).max(axis=1)
+    crest = np.divide(peak, rms, out=np.zeros_like(peak), where=rms > 0)
+
+    harmonics = np.zeros((len(frames), n_harmonics))
+    if n_harmonics:
+        spectrum = np.fft.rfft(frames, axis=1)
+        energy = (spectrum.real ** 2 + spectrum.imag ** 2) / window ** 2
+        bins = np.arange(1, n_harmonics + 1) * int(cycles)
+        bins = bins[bins < energy.shape[1]]
+        harmonics[:, :len(bins)] = energy[:, bins]
+    fundamental = harmonics[:, 0] if n_harmonics else np.zeros(len(frames))
+    distortion = np.sqrt(harmonics[:, 1:].sum(axis=1))
+    thd = np.divide(distortion, np.sqrt(fundamental), out=np.zeros_like(distortion), where=fundamental > 0)
+    return np.column_stack((rms, peak, crest, harmonics, thd))
+
+
+def extract(v, sample_rate, frequency=FREQUENCY, cycles=None, hop=None, n_harmonics=N_HARMONICS):
+    # Devuelve (caracteristicas, indice de inicio de cada ventana). Sin `cycles` se usa
+    # harmonic_cycles(); con n_harmonics=0 tambien sirven ventanas de medio ciclo
+    if cycles is None:
+        cycles = harmonic_cycles(sample_rate, frequency) if n_harmonics else 1
+    _check_cycles(sample_rate, frequency, cycles, n_harmonics)
+    window = window_length(sample_rate, frequency, cycles)
+    hop = hop or window
+    frames = frame_signal(v, window, hop)
+    return window_features(frames, n_harmonics, cycles), np.arange(len(frames)) * hop
+
+
+def window_labels(labels, window, hop=None):
+    # Etiqueta de cada ventana: la mas frecuente entre sus muestras
+    frames = frame_signal(np.asarray(labels), window, hop).astype(np.int64)
+    if not len(frames):
+        return np.empty(0, dtype=np.int64)
+    counts = np.stack([(frames == c).sum(axis=1) for c in range(int(frames.max()) + 1)], axis=1)
+    return counts.argmax(axis=1)
+
+
+class StreamingFeatureExtractor:
+    """Calcula caracteristicas por ventana sobre una senal que llega por bloques.
+
+    Guarda entre bloques solo las muestras que aun no completan una ventana; los indices
+    devueltos son absolutos desde el inicio del flujo.
+    """
+
+    def __init__(self, sample_rate, frequency=FREQUENCY, cycles=None, hop=None, n_harmonics=N_HARMONICS):
+        if cycles is None:
+            cycles = harmonic_cycles(sample_rate, frequency) if n_harmonics else 1
+        _check_cycles(sample_rate, frequency, cycles, n_harmonics)
+        self.cycles = cycles
+        self.window = window_length(sample_rate, frequency, cycles)
+        self.hop = hop or self.window
+        self.n_harmonics = n_harmonics
+        self._pending = np.empty(0)
+        self._offset = 0
+
+    def push(self, chunk):
+        data = np.concatenate((self._pending, np.asarray(chunk, dtype=np.float64)))
+        frames = frame_signal(data, self.window, self.hop)
+        starts = self._offset + np.arange(len(frames)) * self.hop
+        consumed = len(frames) * self.hop
+        self._pending = data[consumed:].copy()
+        self._offset += consumed
+        return window_features(frames, self.n_harmonics, self.cycles), starts
@@ -3,14 +3,10 @@ from PIL import Image, ImageTk
 import sqlite3
 import hashlib
 import os 
+from basedatos import create_sqlite_connection
 
 def create_connection():
-    try:
-        connection = sqlite3.connect('registros.db')
-        return connection
-    except sqlite3.Error as e:
-        print(f"Error: {e}")
-    return None
+    return create_sqlite_connection()
 
 def check_credentials(usuario, contrasena):
     connection = create_connection()
@@ -25,7 +21,6 @@ def check_credentials(usuario, contrasena):
             print(f"Error en check_credentials: {e}")
         finally:
             cursor.close()
-            connection.close()
     return False
 
 
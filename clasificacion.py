@@ -0,0 +1,150 @@
+import os
+import numpy as np
+from joblib import dump
+from modelos import get_model
+from bosque import FlatForest, SMALL_BATCH
+import caracteristicas
+
+# Clases del clasificador combinado; el indice es la etiqueta que predice el bosque
+CLASSES = ('normal', 'swell', 'sag', 'armonico')
+MULTICLASS_MODEL_PATH = 'Modelos_RandomForest/modelo_random_forest_multiclase.joblib'
+WINDOW_MODEL_PATH = 'Modelos_RandomForest/modelo_random_forest_ventanas.joblib'
+
+
+def synthetic_signal():
+    """Senal de prueba que grafica modelosFVFinal.py, con la etiqueta de cada muestra.
+
+    Devuelve t, la senal limpia v, la senal con fenomenos v_combined y las etiquetas
+    (indices de CLASSES). Cuando dos fenomenos se superponen manda el ultimo aplicado,
+    igual que en la senal.
+    """
+    t = np.linspace(0, 10, 10000)
+    v = np.sin(2 * np.pi * 60 * t) + 0.5 * np.sin(2 * np.pi * 180 * t)
+    labels = np.zeros(len(t), dtype=np.int64)
+
+    v_combined = v.copy()
+    v_combined[5000:6000] = v[5000:6000] * 1.1  # Swell
+    labels[5000:6000] = CLASSES.index('swell')
+    v_combined[2000:2500] = v[2000:2500] * 0.4  # Sag
+    labels[2000:2500] = CLASSES.index('sag')
+    v_combined[5000:5500] = v[5000:5500] * 0.9  # Sag
+    labels[5000:5500] = CLASSES.index('sag')
+
+    A_1 = 1
+    a_1 = 0
+    x = np.linspace(0, 2*np.pi, 2000)
+    v_combined[6000:8000] = np.sqrt(2) * A_1 * np.sin(9*x + 9*(a_1))  # Armónico
+    labels[6000:8000] = CLASSES.index('armonico')
+    return t, v, v_combined, labels
+
+
+def train_multiclass(X, labels, n_estimators=100, random_state=42, path=None):
+    from sklearn.ensemble import RandomForestClassifier
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=random_state, n_jobs=-1)
+    model.fit(X, labels)
+    model.n_jobs = None
+    if path is not None:
+        dump(model, path, compress=3)
+    return model
+
+
+class DisturbanceClassifier:
+    """Detecta swell, sag y armonicos con un solo bosque multiclase.
+
+    Cada llamada a detect() evalua el bosque una vez y devuelve la clase por muestra, las
+    probabilidades de todas las clases y una mascara por fenomeno.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.forest = FlatForest.from_sklearn(model)
+        self.classes = [CLASSES[int(c)] for c in model.classes_]
+
+    @classmethod
+    def load(cls, path=MULTICLASS_MODEL_PATH):
+        if not os.path.exists(path):
+            t, v, v_combined, labels = synthetic_signal()
+            train_multiclass(np.column_stack((v, v_combined)), labels, path=path)
+        return cls(get_model(path))
+
+    def predict_proba(self, X):
+        if len(X) <= SMALL_BATCH:
+            return self.forest.predict_proba(X)
+        return self.model.predict_proba(X)
+
+    def detect(self, X):
+        proba = self.predict_proba(X)
+        index = proba.argmax(axis=1)
+        labels = self.model.classes_.take(index).astype(np.int64)
+        masks = {name: labels == CLASSES.index(name) for name in CLASSES[1:]}
+        return labels, proba, masks
+
+
+class WindowClassifier:
+    """Clasificador multiclase que trabaja con caracteristicas por ventana (caracteristicas.py).
+
+    Evalua el bosque una vez por ventana en lugar de una vez por muestra; detect() devuelve
+    la clase de cada ventana y su expansion a etiquetas por muestra. Las ventanas abarcan un
+    numero entero de ciclos (caracteristicas.harmonic_cycles), asi las caracteristicas no
+    dependen de la tasa de muestreo y el mismo modelo sirve para el flujo en vivo (stream()).
+    """
+
+    def __init__(self, model, sample_rate, frequency=caracteristicas.FREQUENCY, cycles=None, nominal_rms=1.0):
+        self.model = model
+        self.forest = FlatForest.from_sklearn(model)
+        self.sample_rate = sample_rate
+        self.frequency = frequency
+        self.cycles = cycles or caracteristicas.harmonic_cycles(sample_rate, frequency)
+        self.window = caracteristicas.window_length(sample_rate, frequency, self.cycles)
+        self.nominal_rms = nominal_rms
+
+    @classmethod
+    def train(cls, v, labels, sample_rate, frequency=caracteristicas.FREQUENCY, cycles=None, path=None):
+        cycles = cycles or caracteristicas.harmonic_cycles(sample_rate, frequency)
+        window = caracteristicas.window_length(sample_rate, frequency, cycles)
+        # Para entrenar se usan ventanas con traslape de medio ciclo para tener mas ejemplos
+        hop = max(window // 2, 1)
+        features, _ = caracteristicas.extract(v, sample_rate, frequency, cycles, hop)
+        model = train_multiclass(features, caracteristicas.window_labels(labels, window, hop))
+        # RMS de la senal normal del entrenamiento: las senales a clasificar se llevan a esta escala
+        normal = np.asarray(v)[np.asarray(labels) == CLASSES.index('normal')]
+        nominal_rms = float(np.sqrt(np.mean(normal ** 2))) if len(normal) else 1.0
+        if path is not None:
+            dump({'model': model, 'sample_rate': sample_rate, 'frequency': frequency, 'cycles': cycles,
+                  'nominal_rms': nominal_rms}, path, compress=3)
+        return cls(model, sample_rate, frequency, cycles, nominal_rms)
+
+    @classmethod
+    def load(cls, path=WINDOW_MODEL_PATH):
+        if not os.path.exists(path):
+            t, v, v_combined, labels = synthetic_signal()
+            return cls.train(v_combined, labels, 1 / (t[1] - t[0]), path=path)
+        saved = get_model(path)
+        if ('nominal_rms' not in saved
+                or not caracteristicas.whole_cycles(saved['sample_rate'], saved['frequency'], saved['cycles'])):
+            # Modelo guardado con el formato anterior (ventanas sin armonicos enteros): se vuelve a entrenar
+            t, v, v_combined, labels = synthetic_signal()
+            return cls.train(v_combined, labels, 1 / (t[1] - t[0]), path=path)
+        return cls(saved['model'], saved['sample_rate'], saved['frequency'], saved['cycles'], saved['nominal_rms'])
+
+    def scale(self, nominal):
+        # Factor que lleva una senal con Urms nominal `nominal` a la escala del entrenamiento
+        return self.nominal_rms / nominal
+
+    def stream(self, sample_rate):
+        # Extractor por bloques con las mismas ventanas (en ciclos) que el modelo
+        return caracteristicas.StreamingFeatureExtractor(sample_rate, self.frequency, self.cycles)
+
+    def predict_features(self, features):
+        if not len(features):
+            return np.empty(0, dtype=np.int64), np.empty((0, len(self.model.classes_)))
+        predictor = self.forest if len(features) <= SMALL_BATCH else self.model
+        proba = predictor.predict_proba(features)
+        return self.model.classes_.take(proba.argmax(axis=1)).astype(np.int64), proba
+
+    def detect(self, v):
+        features, starts = caracteristicas.extract(v, self.sample_rate, self.frequency, self.cycles)
+        window_labels, proba = self.predict_features(features)
+        labels = np.zeros(len(v), dtype=np.int64)
+        labels[:len(window_labels) * self.window] = np.repeat(window_labels, self.window)
+        return window_labels, proba, labels
@@ -0,0 +1,337 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+import numpy as np
+import pandas as pd
+from modelos import get_compiled_model, get_model
+from bosque import SMALL_BATCH
+import rms as urms
+import eventos
+from almacenamiento import estimate_sample_rate
+# scipy ya es dependencia de scikit-learn; se usa solo para el calculo de prominencias
+from scipy.signal import peak_prominences
+
+SWELL_MODEL_PATH = 'Modelos_RandomForest/modelo_random_forest_swell.joblib'
+VOLTAGE_NOMINAL = 220
+# Detecciones separadas por menos de estos ciclos se cuentan como un mismo evento
+EVENT_GAP_CYCLES = 2
+# Subir cuando cambia la logica de deteccion: los eventos guardados con otra version se recalculan
+DETECTOR_REVISION = 4
+
+Detection = namedtuple('Detection', ['t', 'v', 'ascent_peaks', 'rms', 'rms_swell', 'swell_detected', 'swell_count',
+                                     'events'])
+
+
+def detect_ascent_peaks(voltage_series, plateaus=False, prominence=None, distance=None):
+    """Marca los maximos locales de la senal.
+
+    Por defecto un pico es una muestra estrictamente mayor que sus dos vecinas (igual que el
+    ciclo original). Con plateaus=True tambien se aceptan mesetas de valores iguales y se marca
+    su muestra central. `prominence` descarta picos con menor prominencia (en voltios) y
+    `distance` exige esa separacion minima en muestras, conservando siempre el pico mas alto.
+    Devuelve una mascara booleana del mismo largo que la senal.
+    """
+    v = np.asarray(voltage_series)
+    ascent_peaks = np.zeros(len(v), dtype=bool)
+    if len(v) < 3:
+        return ascent_peaks
+
+    if plateaus:
+        peaks = _plateau_peaks(v)
+    else:
+        peaks = np.flatnonzero((v[:-2] < v[1:-1]) & (v[1:-1] > v[2:])) + 1
+
+    # Mismo orden que scipy.signal.find_peaks: primero la distancia y despues la prominencia
+    if distance is not None and distance > 1 and len(peaks) > 1:
+        peaks = _select_by_distance(v, peaks, distance)
+    if prominence is not None and len(peaks):
+        peaks = peaks[peak_prominences(v, peaks)[0] >= prominence]
+
+    ascent_peaks[peaks] = True
+    return ascent_peaks
+
+
+def _plateau_peaks(v):
+    # Solo importan los cambios de valor: un pico es una subida seguida de una bajada,
+    # con cualquier cantidad de muestras iguales entre ambas
+    changes = np.flatnonzero(np.diff(v))
+    if len(changes) < 2:
+        return np.empty(0, dtype=np.intp)
+    rising = v[changes + 1] > v[changes]
+    tops = np.flatnonzero(rising[:-1] & ~rising[1:])
+    left = changes[tops] + 1
+    right = changes[tops + 1]
+    return (left + right) // 2
+
+
+def _select_by_distance(v, peaks, distance):
+    keep = np.ones(len(peaks), dtype=bool)
+    # Los picos sin vecinos a menos de `distance` se conservan sin mas; el resto se resuelve
+    # del mas alto al mas bajo, y cada pico conservado descarta a sus vecinos cercanos
+    close = np.diff(peaks) < distance
+    conflicted = np.zeros(len(peaks), dtype=bool)
+    conflicted[:-1] |= close
+    conflicted[1:] |= close
+    candidates = np.flatnonzero(conflicted)
+    for i in candidates[np.argsort(v[peaks[candidates]], kind='stable')[::-1]]:
+        if not keep[i]:
+            continue
+        lo = np.searchsorted(peaks, peaks[i] - distance + 1)
+        hi = np.searchsorted(peaks, peaks[i] + distance)
+        keep[lo:hi] = False
+        keep[i] = True
+    return peaks[keep]
+
+
+def event_gap(rate):
+    # Detecciones de un mismo evento estan separadas por como mucho EVENT_GAP_CYCLES ciclos
+    # (y siempre se admiten unas pocas muestras)
+    return max(EVENT_GAP_CYCLES * urms.cycle_length(rate), 3)
+
+
+def _file_digest(path, stat):
+    # Hash del archivo del modelo; se recalcula solo si cambian su fecha o su tamano
+    cached = _digests.get(path)
+    if cached is None or cached[0] != stat:
+        digest = hashlib.blake2b(digest_size=8)
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        cached = _digests[path] = (stat, digest.hexdigest())
+    return cached[1]
+
+
+_digests = {}
+
+
+def content_key(t, v):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(t).tobytes())
+    digest.update(np.ascontiguousarray(v).tobytes())
+    return digest.hexdigest()
+
+
+class DetectionPipeline:
+    """Picos -> Urms(1/2) -> RandomForest -> coincidencia, calculado una vez por grabacion.
+
+    Un pico es swell si el bosque lo marca y ademas el Urms(1/2) vigente supera el umbral
+    de swell (rms.classify) respecto de `voltage_nominal`. El bosque se entreno con la senal en
+    por unidad, por eso sus entradas se dividen por `voltage_nominal`: ambas condiciones usan
+    la misma escala.
+
+    Los resultados se guardan en una cache LRU de `cache_size` entradas, con la clave que
+    entregue quien llama (p. ej. el id de la adquisicion) o, si no hay, un hash del contenido.
+    La cache se puede usar desde varios hilos (la interfaz calcula en un TaskExecutor).
+    """
+
+    def __init__(self, model_path=SWELL_MODEL_PATH, voltage_nominal=VOLTAGE_NOMINAL, cache_size=8):
+        self.model_path = model_path
+        self.voltage_nominal = voltage_nominal
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        return get_model(self.model_path)
+
+    @property
+    def forest(self):
+        return get_compiled_model(self.model_path)
+
+    @property
+    def version(self):
+        """Identifica la deteccion: revision del codigo, modelo, tension y umbrales.
+
+        Se guarda junto a los eventos de cada grabacion para saber cuando estan desactualizados.
+        """
+        path = os.path.abspath(self.model_path)
+        stat = os.stat(path)
+        model = _file_digest(path, (stat.st_mtime_ns, stat.st_size))
+        return (f"{DETECTOR_REVISION}:{model}:{self.voltage_nominal:g}:{urms.SWELL_THRESHOLD:g}:"
+                f"{urms.SAG_THRESHOLD:g}:{EVENT_GAP_CYCLES}")
+
+    def get(self, key):
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+            return result
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key, None)
+
+    def run(self, t, v, key=None, rate=None):
+        if key is None:
+            key = content_key(t, v)
+        result = self.get(key)
+        if result is None:
+            result = self.compute(t, v, rate)
+            with self._lock:
+                self._cache[key] = result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def run_csv(self, path):
+        # La clave incluye la fecha de modificacion: si el archivo cambia se vuelve a calcular
+        stat = os.stat(path)
+        key = ('csv', os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        result = self.get(key)
+        if result is None:
+            datos = pd.read_csv(path, header=None, names=['tiempo', 'voltaje']).astype(float)
+            result = self.run(datos['tiempo'].values, datos['voltaje'].values, key)
+        return result
+
+    def compute(self, t, v, rate=None):
+        """Detecta los swells de una grabacion.
+
+        `rate` es la tasa de muestreo declarada (p. ej. adquisiciones.tasa_muestreo); sin ella se
+        estima con almacenamiento.estimate_sample_rate(t), o 1 muestra/s si no se puede. Define la
+        ventana de Urms(1/2), la separacion entre eventos y el periodo con el que se cierra cada
+        evento, igual que en OnlineDetector.
+        """
+        ascent_peaks = detect_ascent_peaks(v)
+        rate = rate or estimate_sample_rate(t) or 1.0
+
+        # Swell segun Urms(1/2) (IEC 61000-4-30) en lugar del valor instantaneo
+        rms = urms.rms_per_sample(v, rate)
+        rms_swell, _ = urms.classify(rms, self.voltage_nominal)
+
+        # El bosque solo se evalua en los picos con Urms(1/2) sobre el umbral
+        swell_detected = np.zeros(len(v), dtype=bool)
+        candidates = np.flatnonzero(ascent_peaks & rms_swell)
+        if len(candidates):
+            X = np.column_stack((v[candidates - 1], v[candidates])) / self.voltage_nominal
+            predictor = self.forest if len(X) <= SMALL_BATCH else self.model
+            swell_detected[candidates] = predictor.predict(X).astype(bool)
+        # Los picos marcados se agrupan en eventos
+        events = eventos.segment(swell_detected, t, rms, 'swell', event_gap(rate), 1.0 / rate)
+        return Detection(t, v, ascent_peaks, rms, rms_swell, swell_detected, len(events), events)
+
+
+class OnlineDetector:
+    """Version por bloques de DetectionPipeline para la adquisicion en vivo.
+
+    Entre bloques guarda solo lo necesario: las dos ultimas muestras (un pico se confirma
+    cuando llega la muestra siguiente), el estado de rms.SlidingRms, el evento abierto y el
+    Urms(1/2) de las muestras posteriores a su ultimo pico, que entran en su magnitud
+    minima/maxima si el evento continua. El bosque solo se evalua en los picos del bloque con
+    Urms(1/2) sobre el umbral. Un evento se emite cuando pasan mas de `max_gap` muestras sin
+    nuevas detecciones, asi la latencia queda acotada por un bloque mas EVENT_GAP_CYCLES ciclos.
+
+    Con la misma `sample_rate`, los eventos son los mismos que los de
+    DetectionPipeline.compute(t, v, sample_rate) sobre la senal completa, para cualquier corte
+    en bloques.
+    """
+
+    def __init__(self, sample_rate, model_path=SWELL_MODEL_PATH, voltage_nominal=VOLTAGE_NOMINAL):
+        self.sample_rate = sample_rate
+        self.model_path = model_path
+        self.voltage_nominal = voltage_nominal
+        self.step = 1.0 / sample_rate
+        self.max_gap = event_gap(sample_rate)
+        self.rms = urms.SlidingRms(sample_rate)
+        self.total = 0
+        self._waiting = []
+        self._prev_t = np.empty(0)
+        self._prev_v = np.empty(0)
+        # Urms(1/2) por muestra desde el indice absoluto _rms_start
+        self._rms = np.empty(0)
+        self._rms_start = 0
+        self._last_rms = None
+        self._open = None
+
+    @property
+    def forest(self):
+        return get_compiled_model(self.model_path)
+
+    def push(self, t, v):
+        t = np.asarray(t, dtype=np.float64)
+        v = np.asarray(v, dtype=np.float64)
+        if len(v) == 0:
+            return []
+
+        values, ends = self.rms.push(v)
+        if self._last_rms is None:
+            # Antes del primer Urms(1/2) las muestras esperan: reciben ese primer valor, como en
+            # rms.rms_per_sample
+            self._waiting.append((t, v))
+            if not len(values):
+                return []
+            t = np.concatenate([block[0] for block in self._waiting])
+            v = np.concatenate([block[1] for block in self._waiting])
+            self._waiting = []
+            self._last_rms = values[0]
+
+        # Urms(1/2) vigente en cada muestra del bloque
+        n = len(v)
+        rms = np.full(n, self._last_rms)
+        if len(values):
+            index = np.searchsorted(ends, np.arange(self.total + 1, self.total + n + 1), side='right') - 1
+            rms[index >= 0] = values[index[index >= 0]]
+            self._last_rms = values[-1]
+        self._rms = np.concatenate((self._rms, rms))
+
+        t_ext = np.concatenate((self._prev_t, t))
+        v_ext = np.concatenate((self._prev_v, v))
+        offset = self.total - len(self._prev_v)
+        self.total += n
+
+        emitted = []
+        if len(v_ext) >= 3:
+            peaks = np.flatnonzero((v_ext[:-2] < v_ext[1:-1]) & (v_ext[1:-1] > v_ext[2:])) + 1
+            if len(peaks):
+                peaks = peaks[urms.classify(self._rms[offset + peaks - self._rms_start], self.voltage_nominal)[0]]
+            if len(peaks):
+                X = np.column_stack((v_ext[peaks - 1], v_ext[peaks])) / self.voltage_nominal
+                peaks = peaks[self.forest.predict(X).astype(bool)]
+            for j in peaks.tolist():
+                emitted.extend(self._add(offset + j, float(t_ext[j])))
+
+        self._prev_t = t_ext[-2:]
+        self._prev_v = v_ext[-2:]
+        # La ultima muestra del bloque aun puede resultar pico, por eso se cuenta desde total - 1
+        if self._open is not None and (self.total - 1) - self._open['last'] - 1 > self.max_gap:
+            emitted.append(self._close())
+        # Se conserva el Urms(1/2) de las dos ultimas muestras y, con un evento abierto, el de las
+        # posteriores a su ultimo pico
+        keep = self.total - 2 if self._open is None else min(self._open['last'] + 1, self.total - 2)
+        if keep > self._rms_start:
+            self._rms = self._rms[keep - self._rms_start:]
+            self._rms_start = keep
+        return emitted
+
+    def _add(self, index, time_value):
+        emitted = []
+        # Misma regla que eventos.runs: se separan si entre ambas hay mas de max_gap muestras
+        if self._open is not None and index - self._open['last'] - 1 > self.max_gap:
+            emitted.append(self._close())
+        if self._open is None:
+            magnitude = float(self._rms[index - self._rms_start])
+            self._open = {'start': index, 'start_t': time_value, 'last': index, 'last_t': time_value,
+                          'min': magnitude, 'max': magnitude}
+        else:
+            # Como eventos.segment, la magnitud abarca todas las muestras del evento, tambien las
+            # de los huecos entre picos
+            span = self._rms[self._open['last'] + 1 - self._rms_start:index + 1 - self._rms_start]
+            self._open['last'] = index
+            self._open['last_t'] = time_value
+            self._open['min'] = min(self._open['min'], float(span.min()))
+            self._open['max'] = max(self._open['max'], float(span.max()))
+        return emitted
+
+    def _close(self):
+        event, self._open = self._open, None
+        fin = event['last_t'] + self.step
+        return eventos.Event('swell', event['start_t'], fin, fin - event['start_t'], event['min'], event['max'],
+                             event['start'], event['last'] + 1)
+
+    def flush(self):
+        # Cierra el evento abierto al terminar la adquisicion
+        return [self._close()] if self._open is not None else []
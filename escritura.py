@@ -0,0 +1,175 @@
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+import almacenamiento
+import basedatos
+from basedatos import DB_PATH, create_sqlite_connection
+
+
+class BufferedWriter(ABC):
+    """Escribe bloques de filas a un destino desde un hilo en segundo plano.
+
+    El hilo de adquisicion solo encola bloques con put(), que no descarta filas: si la cola esta
+    llena espera a que el hilo de escritura haga lugar. Las filas se acumulan y se escriben
+    cuando superan `max_rows` o pasan `max_delay` segundos, y al llamar stop(). Si la escritura
+    falla el hilo termina, y put() y stop() lanzan el error para que la adquisicion se detenga.
+    """
+
+    def __init__(self, filename, max_rows=2048, max_delay=1.0, queue_size=256):
+        self.filename = filename
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.queued = 0
+        self.written = 0
+        self.error = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def put(self, rows):
+        while True:
+            self._raise_error()
+            if self._thread is None or not self._thread.is_alive():
+                raise RuntimeError("El hilo de escritura no esta activo")
+            try:
+                self.queue.put(rows, timeout=0.1)
+                self.queued += len(rows)
+                return True
+            except queue.Full:
+                pass
+
+    def stop(self):
+        # Si el hilo ya termino por un error la cola puede estar llena: no se espera lugar para siempre
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        while thread.is_alive():
+            try:
+                self.queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError(f"Error en el hilo de escritura: {self.error}") from self.error
+
+    @abstractmethod
+    def _open(self):
+        """Abre el destino; corre en el hilo de escritura."""
+
+    @abstractmethod
+    def _write(self, rows):
+        """Escribe un bloque de filas."""
+
+    def _flush(self):
+        # Se llama despues de cada tanda de bloques; por defecto no hace nada
+        pass
+
+    @abstractmethod
+    def _close(self):
+        """Escribe lo pendiente y cierra el destino."""
+
+    def _run(self):
+        try:
+            self._consume()
+        except Exception as e:
+            # stop() lo informa en el hilo que detiene el escritor
+            self.error = e
+
+    def _consume(self):
+        pending = []
+        pending_rows = 0
+        last_flush = time.monotonic()
+        self._open()
+        try:
+            while True:
+                timeout = max(self.max_delay - (time.monotonic() - last_flush), 0.01)
+                try:
+                    rows = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    rows = ()
+                if rows is None:
+                    break
+                if len(rows):
+                    pending.append(rows)
+                    pending_rows += len(rows)
+                if pending_rows >= self.max_rows or time.monotonic() - last_flush >= self.max_delay:
+                    for block in pending:
+                        self._write(block)
+                    self._flush()
+                    self.written += pending_rows
+                    pending = []
+                    pending_rows = 0
+                    last_flush = time.monotonic()
+        finally:
+            for block in pending:
+                self._write(block)
+            self.written += pending_rows
+            self._close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class SessionWriter(BufferedWriter):
+    """Guarda la adquisicion en la base como una sesion, en bloques de `chunk_size` muestras.
+
+    Cada bloque completo se confirma en su propia transaccion (almacenamiento.append_session_chunk),
+    asi la memoria queda acotada a un bloque y una caida pierde como mucho el bloque en curso.
+    stop() guarda el bloque incompleto. Para reanudar una sesion se pasa `sequence`, el numero
+    de secuencia del siguiente bloque.
+    """
+
+    def __init__(self, session_id, db_path=DB_PATH, chunk_size=almacenamiento.SESSION_CHUNK_SIZE, sequence=0,
+                 **kwargs):
+        super().__init__(db_path, **kwargs)
+        self.session_id = session_id
+        self.chunk_size = chunk_size
+        self.sequence = sequence
+        self.chunks = 0
+
+    def _open(self):
+        # Conexion propia del hilo de escritura
+        self.connection = create_sqlite_connection(self.filename)
+        self._t = np.empty(self.chunk_size, dtype=np.float64)
+        self._v = np.empty(self.chunk_size, dtype=np.float64)
+        self._count = 0
+
+    def _write(self, rows):
+        start = 0
+        while start < len(rows):
+            n = min(self.chunk_size - self._count, len(rows) - start)
+            self._t[self._count:self._count + n] = rows[start:start + n, 0]
+            self._v[self._count:self._count + n] = rows[start:start + n, 1]
+            self._count += n
+            start += n
+            if self._count == self.chunk_size:
+                self._commit()
+
+    def _commit(self):
+        almacenamiento.append_session_chunk(self.connection, self.session_id, self.sequence,
+                                            self._t[:self._count], self._v[:self._count])
+        self.sequence += 1
+        self.chunks += 1
+        self._count = 0
+
+    def _close(self):
+        # La conexion es del hilo de escritura: se cierra aqui, close_all() no puede cerrarla desde otro hilo
+        try:
+            if self._count:
+                self._commit()
+        finally:
+            self.connection = None
+            basedatos.close_connection(self.filename)
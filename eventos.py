@@ -0,0 +1,52 @@
+from collections import namedtuple
+import numpy as np
+
+# inicio/fin en segundos; muestra_inicio/muestra_fin son indices (fin exclusivo)
+Event = namedtuple('Event', ['tipo', 'inicio', 'fin', 'duracion', 'magnitud_min', 'magnitud_max',
+                             'muestra_inicio', 'muestra_fin'])
+
+
+def runs(mask, max_gap=0):
+    """Tramos consecutivos en True de una mascara booleana, como (inicios, fines) con fin exclusivo.
+
+    Los tramos separados por `max_gap` muestras o menos se unen en uno solo.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if max_gap > 0 and len(starts) > 1:
+        separate = starts[1:] - ends[:-1] > max_gap
+        starts = starts[np.concatenate(([True], separate))]
+        ends = ends[np.concatenate((separate, [True]))]
+    return starts, ends
+
+
+def segment(mask, t, magnitude, tipo, max_gap=0, step=None):
+    # Convierte una mascara por muestra en eventos con su duracion y magnitud minima/maxima;
+    # `step` es el periodo de muestreo (por defecto, la mediana de los intervalos de t)
+    starts, ends = runs(mask, max_gap)
+    if not len(starts):
+        return []
+    t = np.asarray(t, dtype=np.float64)
+    magnitude = np.asarray(magnitude, dtype=np.float64)
+    # reduceat sobre [inicio, fin) de cada tramo; se agrega un elemento para que fin == len sea valido
+    padded = np.concatenate((magnitude, [0.0]))
+    bounds = np.column_stack((starts, ends)).ravel()
+    low = np.minimum.reduceat(padded, bounds)[::2]
+    high = np.maximum.reduceat(padded, bounds)[::2]
+    last = ends - 1
+    # La duracion incluye el intervalo de la ultima muestra del tramo
+    if step is None:
+        step = np.median(np.diff(t)) if len(t) > 1 else 0.0
+    inicio = t[starts]
+    fin = t[last] + step
+    return [Event(tipo, *values) for values in zip(inicio.tolist(), fin.tolist(), (fin - inicio).tolist(),
+                                                    low.tolist(), high.tolist(), starts.tolist(), ends.tolist())]
+
+
+def count_by_type(events):
+    counts = {}
+    for event in events:
+        counts[event.tipo] = counts.get(event.tipo, 0) + 1
+    return counts
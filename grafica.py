@@ -0,0 +1,219 @@
+import time
+from collections import deque
+import numpy as np
+from matplotlib.collections import PolyCollection
+
+
+class FrameTimer:
+    """Tiempo de dibujo de los ultimos cuadros, para comprobar que se sostiene el intervalo."""
+
+    def __init__(self, interval, history=200):
+        self.interval = interval
+        self.times = deque(maxlen=history)
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+
+    def stop(self):
+        self.times.append((time.perf_counter() - self._start) * 1000)
+
+    def stats(self):
+        # (media, maximo, cuadros que superaron el intervalo) en milisegundos
+        if not self.times:
+            return 0.0, 0.0, 0
+        times = np.fromiter(self.times, dtype=np.float64)
+        return times.mean(), times.max(), int((times > self.interval).sum())
+
+    def report(self):
+        mean, worst, late = self.stats()
+        return (f"cuadro medio {mean:.1f} ms, maximo {worst:.1f} ms, "
+                f"{late}/{len(self.times)} sobre el intervalo de {self.interval} ms")
+
+
+def visible(t, start, end):
+    # Slice de las muestras en [start, end] de un vector de tiempos ordenado, con una muestra
+    # extra a cada lado para que la linea llegue a los bordes
+    first, last = np.searchsorted(t, (start, end))
+    return slice(max(first - 1, 0), last + 1)
+
+
+def _reduce(values, starts, function):
+    return function.reduceat(values, starts) if len(values) else values
+
+
+class EnvelopePyramid:
+    """Piramide de envolventes min/max de una adquisicion para graficarla a cualquier escala.
+
+    El nivel 0 son las muestras; cada nivel siguiente junta `factor` bloques del anterior y
+    guarda su minimo, su maximo y si alguno estaba marcado en `mask`. window() elige el nivel
+    mas grueso que todavia da al menos `points` bloques en la ventana, asi la grafica recibe
+    del orden de un punto por pixel sin importar el largo de la adquisicion. Los bloques se
+    dibujan como una banda entre minimo y maximo (ScrollingPlot.set_trace).
+    """
+
+    def __init__(self, t, v, mask=None, factor=4, min_blocks=256):
+        t = np.asarray(t, dtype=np.float64)
+        v = np.asarray(v, dtype=np.float64)
+        mask = np.zeros(len(v), dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+        self.factor = factor
+        self.levels = [(t, v, v, mask)]
+        while len(self.levels[-1][0]) > min_blocks:
+            t, low, high, mask = self.levels[-1]
+            starts = np.arange(0, len(t), factor)
+            self.levels.append((t[starts], _reduce(low, starts, np.minimum),
+                                _reduce(high, starts, np.maximum), _reduce(mask, starts, np.logical_or)))
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for level in self.levels[1:] for array in level)
+
+    def level_for(self, start, end, points):
+        first, last = np.searchsorted(self.levels[0][0], (start, end))
+        level = 0
+        while level + 1 < len(self.levels) and (last - first) // self.factor ** (level + 1) >= points:
+            level += 1
+        return level
+
+    def window(self, start, end, points):
+        """Devuelve (t, minimo, maximo, t_marcas, v_marcas) de [start, end] con unos `points` bloques.
+
+        En el nivel 0 minimo y maximo son el mismo arreglo de muestras; las marcas se ubican en
+        el maximo de cada bloque marcado.
+        """
+        level = self.level_for(start, end, points)
+        t, low, high, mask = self.levels[level]
+        window = visible(t, start, end)
+        t, high, mask = t[window], high[window], mask[window]
+        low = high if level == 0 else low[window]
+        return t, low, high, t[mask], high[mask]
+
+
+def envelope(t, v, points):
+    # Envolvente (t, minimo, maximo) de una sola ventana, p. ej. el buffer en vivo
+    if len(t) <= 2 * points:
+        return t, v, v
+    starts = np.arange(0, len(t), -(-len(t) // points))
+    return t[starts], np.minimum.reduceat(v, starts), np.maximum.reduceat(v, starts)
+
+
+class ScrollingPlot:
+    """Grafica con desplazamiento que reutiliza sus artistas y redibuja con blitting.
+
+    Las lineas y areas se crean una vez y cada cuadro solo recibe la porcion visible. El eje x
+    va de 0 a `window` segundos contados desde el inicio de la ventana (que se muestra en un
+    texto), asi ejes, grilla y etiquetas no cambian y quedan en un fondo guardado; cada cuadro
+    restaura ese fondo y dibuja encima solo los artistas animados.
+
+    `update(frame)` se llama en cada cuadro, actualiza los artistas y devuelve el inicio de la
+    ventana en segundos, o None para no redibujar. `event_source` es el temporizador, igual
+    que en FuncAnimation.
+    """
+
+    def __init__(self, fig, ax, update, window=10.0, interval=100):
+        self.fig = fig
+        self.ax = ax
+        self.canvas = fig.canvas
+        self.update = update
+        self.window = window
+        self.frame = 0
+        self.timer = FrameTimer(interval)
+        self.artists = []
+        self._background = None
+        self._ylim_set = False
+        ax.set_xlim(0, window)
+        self.label = self.add(ax.text(0.01, 0.98, '', transform=ax.transAxes, va='top'))
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.event_source = self.canvas.new_timer(interval=interval)
+        self.event_source.add_callback(self._tick)
+        self.event_source.start()
+
+    def add(self, artist):
+        artist.set_animated(True)
+        self.artists.append(artist)
+        return artist
+
+    def add_line(self, *args, **kwargs):
+        line, = self.ax.plot([], [], *args, **kwargs)
+        return self.add(line)
+
+    def add_area(self, **kwargs):
+        return self.add(self.ax.add_collection(PolyCollection([], **kwargs)))
+
+    def add_trace(self, color, linewidth=0.8):
+        # Senal que se dibuja como linea o, si llega decimada, como banda min/max
+        return (self.add_line(color=color, linewidth=linewidth),
+                self.add_area(color=color, linewidth=linewidth))
+
+    @property
+    def pixels(self):
+        # Ancho del area de graficado en pixeles: mas puntos por cuadro no se pueden ver
+        return max(int(self.ax.bbox.width), 1)
+
+    def set_line(self, line, t, v, start):
+        line.set_data(t - start, v)
+
+    def set_trace(self, trace, t, low, high, start):
+        # Rellenar la banda es mucho mas barato para Agg que una linea que sube y baja en cada pixel
+        line, area = trace
+        if low is high:
+            self.set_line(line, t, high, start)
+            area.set_verts([])
+        else:
+            line.set_data([], [])
+            self.set_fill(area, t, low, high, start)
+
+    def set_fill(self, area, t, low, high, start):
+        # Area entre dos curvas, como fill_between
+        if len(t) < 2:
+            area.set_verts([])
+            return
+        x = t - start
+        area.set_verts([np.column_stack((np.concatenate((x, x[::-1])), np.concatenate((low, high[::-1]))))])
+
+    def set_spans(self, area, starts, ends, start):
+        # Franjas verticales de alto completo, como axvspan
+        low, high = self.ax.get_ylim()
+        area.set_verts([((a - start, low), (b - start, low), (b - start, high), (a - start, high))
+                        for a, b in zip(starts, ends)])
+
+    def fit_y(self, v, margin=0.1):
+        # Amplia el eje y solo cuando los datos se salen; cambiar limites obliga a rehacer el fondo
+        if not len(v):
+            return
+        low, high = float(np.min(v)), float(np.max(v))
+        current = self.ax.get_ylim()
+        if self._ylim_set and low >= current[0] and high <= current[1]:
+            return
+        span = (high - low) or 1.0
+        self.ax.set_ylim(low - margin * span, high + margin * span)
+        self._ylim_set = True
+        self._background = None
+        self.canvas.draw_idle()
+
+    def stop(self):
+        self.event_source.stop()
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for artist in self.artists:
+            self.fig.draw_artist(artist)
+
+    def _tick(self):
+        self.timer.start()
+        start = self.update(self.frame)
+        self.frame += 1
+        if start is None:
+            return
+        self.label.set_text(f"{start:.2f} s - {start + self.window:.2f} s")
+        if self._background is None:
+            # Aun no hay fondo (primer cuadro o limites cambiados): el dibujo completo lo guarda
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_artists()
+        self.canvas.blit(self.fig.bbox)
+        self.timer.stop()
@@ -1,40 +1,33 @@
 #en esta parte va un ejemplo de uso del modulo animation
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 import pandas as pd
+from grafica import ScrollingPlot, visible
 
 t = np.linspace(0, 10, 10000)
 v = np.sin(2 * np.pi * 60 * t) + 0.5 * np.sin(2 * np.pi * 180 * t)
 v_swell = v.copy()
 v_swell[2000:4000] = v[2000:4000] * 1.1
 
-def update(frame):
-    ax.clear()
-    xlim_start = frame % 10  
-    xlim_end = (frame + 0.04) % 10
-    if xlim_end < xlim_start: 
-        xlim_end += 10
-
-    ax.set_xlim(xlim_start, xlim_end)
-    ax.plot(t, v, 'r')
-    ax.plot(t, v_swell, 'k')
-
-    swell_mask = (t >= xlim_start) & (t <= xlim_end)
-    ax.fill_between(t[swell_mask], v[swell_mask], v_swell[swell_mask], color='yellow', alpha=0.5)
-
-    ax.set_xlabel('Tiempo (s)')
-    ax.set_ylabel('Voltaje')
-    ax.legend()
-
 fig, ax = plt.subplots()
+ax.set_xlabel('Tiempo en la ventana (s)')
+ax.set_ylabel('Voltaje')
 
-def frame_gen():
-    frame = 0
-    while True:
-        yield frame
-        frame += 0.09
-
-ani = FuncAnimation(fig, update, frames=frame_gen(), interval=50)
+def update(frame):
+    # Ventana de 0.04 s que avanza 0.09 s por cuadro
+    xlim_start = (frame * 0.09) % 10
+    window = visible(t, xlim_start, xlim_start + plot.window)
+    plot.set_line(signal, t[window], v[window], xlim_start)
+    plot.set_line(swell, t[window], v_swell[window], xlim_start)
+    plot.set_fill(area, t[window], v[window], v_swell[window], xlim_start)
+    return xlim_start
+
+plot = ScrollingPlot(fig, ax, update, window=0.04, interval=50)
+signal = plot.add_line('r', label='Senal')
+swell = plot.add_line('k', label='Swell')
+area = plot.add_area(color='yellow', alpha=0.5)
+plot.fit_y(np.concatenate((v, v_swell)))
+ax.legend()
 
 plt.show()
+print(plot.timer.report())
@@ -1,76 +1,50 @@
-import io
-import sys
 import os
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from joblib import load
-import time
-import csv
-from tkinter import BOTH, LEFT, NW, RIGHT, VERTICAL, W, Y, Button, Frame, Tk, messagebox, ttk
+from tkinter import BOTH, LEFT, NW, RIGHT, VERTICAL, W, Y, Button, Frame, Label, Tk, filedialog, messagebox, ttk
 from PIL import Image, ImageTk
-import sqlite3
-from datetime import datetime
 import threading
-
-if sys.platform.startswith('linux'):
-    import smbus2 as smbus
-else:
-    smbus = None
-
-
-ADDRESS = 0x48
-CHANNEL = 0
-CONFIG_REG = 0x01
-CONVERSION_REG = 0x00
-GAIN = 1/2
-
-
-def read_adc(): 
-    bus = smbus.SMBus(1)
-    config = (0b100 << 10) | (CHANNEL << 9) | (0b111 << 5) | 0b100
-    bus.write_i2c_block_data(ADDRESS, CONFIG_REG, [(config >> 8) & 0xFF, config & 0xFF])
-    time.sleep(0.05)
-    data = bus.read_i2c_block_data(ADDRESS, CONVERSION_REG, 2)
-    value = (data[0] << 8 | data[1]) & 0xFFFF
-    if value > 0x7FFF:
-        value -= 0xFFFF
-    voltage = value * ( 2.048 / 32767) / GAIN
-    return voltage
-
-def write_to_csv(filename, data):
-    with open(filename, 'a', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(data)
-        return None
-    
-            
-def save_csv_to_db(filename):
+from adc import ADDRESS, ADS1115, CHANNEL, DATA_RATE
+from adquisicion import AcquisitionEngine, BufferTail
+from escritura import SessionWriter
+from grafica import EnvelopePyramid, ScrollingPlot, envelope
+import almacenamiento
+import binario
+from deteccion import VOLTAGE_NOMINAL, DetectionPipeline, OnlineDetector
+from clasificacion import CLASSES, WindowClassifier
+from basedatos import create_sqlite_connection
+import basedatos
+from tareas import TaskExecutor
+
+EXAMPLE_FILE = 'data/adc_datsa.csv'
+SENSOR = f'ADS1115-{ADDRESS:#04x}-A{CHANNEL}'
+# Fenomenos que detecta y guarda la interfaz (los sags por Urms(1/2) solo los guarda lote.py)
+TIPOS = ('swell',)
+
+
+def init_db():
     connection = create_sqlite_connection()
     if connection:
-        cursor = connection.cursor()
-        with open(filename, 'r') as file:
-            csv_data = file.read()
-        fecha_guardado = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("INSERT INTO adquisiciones (archivo_csv, fecha_guardado) VALUES (?, ?)", (csv_data, fecha_guardado))
-        connection.commit()
-        cursor.close()
-        connection.close()
-        with open(filename, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([])
-        return None
-            
-
-def create_sqlite_connection():
-    try:
-        connection = sqlite3.connect('registros.db')
-        return connection
-    except sqlite3.Error as e:
-        print(f"Error: {e}")
-    return None
+        migrated = almacenamiento.migrate(connection)
+        if migrated:
+            print(f"Migradas {migrated} adquisiciones al nuevo formato de almacenamiento")
+
+
+def calibration_profile(sensor=SENSOR):
+    """Perfil de calibracion vigente del sensor, guardado en la base.
+
+    La primera vez se ajusta con los puntos medidos y se guarda; despues solo se lee.
+    """
+    connection = create_sqlite_connection()
+    calibration = almacenamiento.load_calibration(connection, sensor)
+    if calibration is None:
+        sensor_values = np.array([0.275, 0.418, 0.425, 0.426, 0.427, 0.428, 0.696])
+        real_values = np.array([129.1, 193.3, 196.2, 196.5, 196.6, 197.0, 220.0])
+        m, b = np.polyfit(sensor_values, real_values, 1)
+        almacenamiento.save_calibration(connection, sensor, m, b - 120)
+        calibration = almacenamiento.load_calibration(connection, sensor)
+    return calibration
 
 
 class MainWindow(Tk):
@@ -84,7 +58,28 @@ class MainWindow(Tk):
         self.center_window(1240,700)
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.acquiring = False
+        self.data_rate = DATA_RATE
+        self.pipeline = DetectionPipeline()
+        # Deteccion y base de datos corren en el pool; los resultados vuelven al hilo de Tk
+        self.tasks = TaskExecutor(self)
+        self.visualization_task = None
+        init_db()
+        # Los eventos calculados con otro modelo o con otros umbrales se recalculan al visualizar
+        almacenamiento.invalidate_events(create_sqlite_connection(), self.pipeline.version)
+        self.calibration = calibration_profile()
+        self.session_id = None
+        self.resume_session = None
+        # El clasificador de ventanas se carga (o se entrena la primera vez) en el pool, no al iniciar
+        # una adquisicion; mientras no este listo la captura sigue sin clasificacion en vivo
+        self.window_classifier = None
         self.initUI()
+        self.after_idle(self.recover_sessions)
+        self.tasks.submit(lambda task: WindowClassifier.load(), name='clasificador',
+                          on_done=self.set_window_classifier, on_error=self.show_task_error)
+        self.refresh_events()
+
+    def set_window_classifier(self, classifier):
+        self.window_classifier = classifier
         
 
     def initUI(self):
@@ -125,6 +120,12 @@ class MainWindow(Tk):
         self.pause_button = Button(self, text='Pausar', bg='#d9534f', fg='white', command=self.toggle_pause)
         self.pause_button.pack(pady=10)
 
+        btn_exportar = Button(self, text='Exportar', bg='#5bc0de', fg='white', command=self.exportar_datos)
+        btn_exportar.place(x=150, y=8)
+
+        self.status_label = Label(self, text='')
+        self.status_label.place(x=600, y=12)
+
         self.init_table(self.panel2)
         self.init_animation(self.panel3)
         self.init_bar_chart(self.panel4)
@@ -135,14 +136,15 @@ class MainWindow(Tk):
         table_frame.place(x=0, y=0, anchor=NW)
         table_frame.pack_propagate(False)  
 
-        self.tree = ttk.Treeview(table_frame, columns=("ID", "CSV", "Fecha"), show='headings', style='Treeview')
-        self.tree.heading("ID", text="ID")
-        self.tree.heading("CSV", text="Archivo CSV")
+        # El id de la base se usa como iid de cada fila; la columna N° es solo el orden de visualizacion
+        self.tree = ttk.Treeview(table_frame, columns=("N", "Resumen", "Fecha"), show='headings', style='Treeview')
+        self.tree.heading("N", text="N°")
+        self.tree.heading("Resumen", text="Duración / Muestras")
         self.tree.heading("Fecha", text="Fecha de Guardado")
 
         # Adjust column widths
-        self.tree.column("ID", width=20, anchor=W)
-        self.tree.column("CSV", width=100, anchor=W)
+        self.tree.column("N", width=20, anchor=W)
+        self.tree.column("Resumen", width=100, anchor=W)
         self.tree.column("Fecha", width=100, anchor=W)
 
         style = ttk.Style()
@@ -162,61 +164,112 @@ class MainWindow(Tk):
         
         self.tree.bind("<ButtonRelease-1>", self.on_tree_select)
         
-        scrollbar = ttk.Scrollbar(table_frame, orient=VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(table_frame, orient=VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
         self.tree.pack(side=LEFT, fill=BOTH, expand=True)
-        scrollbar.pack(side=RIGHT, fill=Y)
-        
+        self.scrollbar.pack(side=RIGHT, fill=Y)
+
+        self.last_loaded_id = None
+        self.table_exhausted = False
+        self.page_pending = False
         self.load_table_data()
 
     def load_table_data(self):
+        # Carga la siguiente pagina de metadatos; las muestras se leen solo al visualizar
+        if self.table_exhausted:
+            return
         connection = create_sqlite_connection()
         if connection:
-            cursor = connection.cursor()
-            cursor.execute("SELECT * FROM adquisiciones")
-            rows = cursor.fetchall()
-            for row in rows:
-                self.tree.insert('', 'end', values=row)
-            cursor.close()
-            connection.close()
+            rows = almacenamiento.list_recordings(connection, self.last_loaded_id)
+            for recording_id, fecha_guardado, duracion, num_muestras in rows:
+                self.insert_table_row(recording_id, fecha_guardado, duracion, num_muestras)
+            if rows:
+                self.last_loaded_id = rows[-1][0]
+            if len(rows) < almacenamiento.PAGE_SIZE:
+                self.table_exhausted = True
+
+    def insert_table_row(self, recording_id, fecha_guardado, duracion, num_muestras):
+        position = len(self.tree.get_children()) + 1
+        self.tree.insert('', 'end', iid=str(recording_id),
+                         values=(position, f"{duracion:.1f} s / {num_muestras}", fecha_guardado))
+
+    def renumber_table_rows(self, start=0):
+        for position, row in enumerate(self.tree.get_children()[start:], start=start + 1):
+            self.tree.set(row, "N", position)
+
+    def on_tree_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) >= 0.9 and not self.table_exhausted and not self.page_pending:
+            self.page_pending = True
+            self.after_idle(self.load_next_page)
+
+    def load_next_page(self):
+        self.page_pending = False
+        self.load_table_data()
     
     def on_tree_select(self, event):
-        selected_item = self.tree.selection()
-        if selected_item:
-            item = self.tree.item(selected_item)
-            self.selected_csv = item['values'][1]
+        selected_items = self.tree.selection()
+        if selected_items:
+            self.selected_id = int(selected_items[-1])
             for row in self.tree.get_children():
                 self.tree.item(row, tags="")
-            self.tree.item(selected_item, tags=("selected",))
+            for row in selected_items:
+                self.tree.item(row, tags=("selected",))
             self.tree.tag_configure("selected", background="blue")
 
     def eliminar_datos(self):
-        selected_item = self.tree.selection()
-        if selected_item:
-            item = self.tree.item(selected_item)
-            selected_id = item['values'][0]
+        selected_items = self.tree.selection()
+        if not selected_items:
+            messagebox.showwarning("Seleccionar", "Por favor seleccione uno o más registros de la tabla para eliminar")
+            return
+        selected_ids = [int(row) for row in selected_items]
+
+        def delete(task):
             connection = create_sqlite_connection()
-            if connection:
-                cursor = connection.cursor()
-                cursor.execute("DELETE FROM adquisiciones WHERE id = ?", (selected_id,))
-                self.tree.delete(selected_item)
-                connection.commit()
-                cursor.execute("SELECT id FROM adquisiciones ORDER BY id")
-                rows = cursor.fetchall()
-                for index, row in enumerate(rows, start=1):
-                    cursor.execute("UPDATE adquisiciones SET id = ? WHERE id = ?", (index, row[0]))
-                connection.commit()
-                cursor.close()
-                connection.close()
-                self.clear_panel_two()
-                self.init_table(self.panel2)
-                messagebox.showinfo("Eliminar", "Registro eliminado y IDs actualizados correctamente")
+            if not connection:
+                raise RuntimeError("No se pudo conectar a la base de datos")
+            almacenamiento.delete_recordings(connection, selected_ids)
+
+        def done(result):
+            rows = [row for row in selected_items if self.tree.exists(row)]
+            if rows:
+                first_index = min(self.tree.index(row) for row in rows)
+                self.tree.delete(*rows)
+                self.renumber_table_rows(first_index)
+            for recording_id in selected_ids:
+                self.pipeline.invalidate(('adquisicion', recording_id))
+            self.refresh_bar_chart()
+            if getattr(self, 'selected_id', None) in selected_ids:
+                del self.selected_id
+            messagebox.showinfo("Eliminar", f"{len(selected_ids)} registro(s) eliminado(s) correctamente")
+
+        self.tasks.submit(delete, name='eliminar', on_done=done, on_error=self.show_task_error)
+
+
+    def exportar_datos(self):
+        if not hasattr(self, 'selected_id'):
+            messagebox.showerror("Error", "Seleccione una adquisición en la tabla primero.")
+            return
+        recording_id = self.selected_id
+        path = filedialog.asksaveasfilename(
+            title="Exportar adquisición", initialfile=f"adquisicion_{recording_id}.csv", defaultextension='.csv',
+            filetypes=[("CSV", "*.csv"), ("Binario (np.memmap)", "*.bin")])
+        if not path:
+            return
+
+        def export(task):
+            task.progress(0.0, 'Exportando adquisición')
+            recording = almacenamiento.RecordingRepository(create_sqlite_connection()).get_recording(recording_id)
+            if recording is None:
+                raise LookupError("No se encontró la adquisición seleccionada.")
+            if path.lower().endswith('.bin'):
+                binario.export_binary(path, recording.t, recording.v, recording.tasa_muestreo)
             else:
-                messagebox.showerror("Error", "No se pudo conectar a la base de datos")
-        else:
-            messagebox.showwarning("Seleccionar", "Por favor seleccione un registro de la tabla para eliminar")
+                binario.export_csv(path, recording.t, recording.v)
+
+        self.tasks.submit(export, name='exportar', on_done=lambda result: self.show_progress(1, ''),
+                          on_error=self.show_task_error, on_progress=self.show_progress)
 
-        
     def center_window(self, width, height):
         screen_width = self.winfo_screenwidth()
         screen_height = self.winfo_screenheight()
@@ -233,37 +286,30 @@ class MainWindow(Tk):
             return None
     
     def init_animation(self, panel):
-        datos = pd.read_csv('data/adc_datsa.csv', header=None, names=['tiempo', 'voltaje'])
-        datos = datos.astype(float)
-        t = datos['tiempo'].values
-        v = datos['voltaje'].values
-
-        def detect_ascent_peaks(voltage_series):
-            ascent_peaks = np.zeros_like(voltage_series, dtype=bool)
-
-            for i in range(1, len(voltage_series) - 1):
-                if voltage_series[i - 1] < voltage_series[i] and voltage_series[i] > voltage_series[i + 1]:
-                    ascent_peaks[i] = True
-
-            return ascent_peaks
-        ascent_peaks = detect_ascent_peaks(v)
-        
-        voltage_nominal = 220
-        lower_threshold = voltage_nominal * 1.1
-        upper_threshold = voltage_nominal * 1.8
-
-        labels = np.zeros_like(v)
-        labels[(v >= lower_threshold) & (v <= upper_threshold)] = 1
-
-        X = np.column_stack((v[:-1], v[1:]))
-        y = labels[1:]
-
-        model_path = 'Modelos_RandomForest/modelo_random_forest_swell.joblib'
-        model = load(model_path)
-        swell_detected = np.zeros_like(labels)
-        swell_detected[1:] = model.predict(X)
-        swell_detected = np.logical_and(swell_detected, ascent_peaks)
-
+        def show(detection):
+            self.animate_recording(panel, detection.t, detection.v, detection.swell_detected, 'Voltaje (V)',
+                                   interval=200)
+
+        self.tasks.submit(lambda task: self.pipeline.run_csv(EXAMPLE_FILE), name='ejemplo',
+                          on_done=show, on_error=self.show_task_error)
+
+    def stop_animation(self):
+        # Detiene el temporizador de la grafica del panel 3 antes de destruirla y muestra sus tiempos
+        plot, self.ani = getattr(self, 'ani', None), None
+        if plot is not None:
+            plot.stop()
+            self.status_label.config(text=f"Gráfica: {plot.timer.report()}")
+            plt.close(plot.fig)
+
+    def show_progress(self, fraction, message):
+        self.status_label.config(text=f"{message} ({fraction:.0%})" if fraction < 1 else '')
+
+    def show_task_error(self, error):
+        self.status_label.config(text='')
+        messagebox.showerror("Error", str(error))
+
+    def animate_recording(self, panel, t, v, swell_detected, ylabel, title=None, interval=100):
+        # Recorre la adquisicion en ventanas de 10 s, avanzando 1 s por cuadro
         fig, ax = plt.subplots()
         canvas = FigureCanvasTkAgg(fig, master=panel)
         canvas.get_tk_widget().pack(fill=BOTH, expand=True)
@@ -272,32 +318,33 @@ class MainWindow(Tk):
         self.v = v
         self.swell_detected = swell_detected
 
+        ax.set_xlabel('Tiempo en la ventana (s)')
+        ax.set_ylabel(ylabel)
+        if title:
+            ax.set_title(title)
+            ax.grid(True)
+
+        # Cada cuadro se sirve desde la piramide min/max con un punto por pixel del panel
+        pyramid = EnvelopePyramid(t, v, swell_detected)
+
         def update(frame):
-            if not self.paused:
-                ax.clear()
-                xlim_start = frame % self.t[-1]
-                xlim_end = (frame + 10) % self.t[-1]
-                if xlim_end < xlim_start: 
-                    xlim_end += self.t[-1]
-
-                ax.set_xlim(xlim_start, xlim_end)
-                ax.plot(self.t, self.v,'r')
-
-                swell_mask = (self.t >= xlim_start) & (self.t <= xlim_end)
-                detected_mask = np.logical_and(self.swell_detected, swell_mask)
-                ax.plot(self.t[detected_mask], self.v[detected_mask], 'go')
-                ax.set_xlabel('Tiempo (s)')
-                ax.set_ylabel('Voltaje (V)')
-
-        def frame_gen():
-            frame = 0
-            while True:
-                yield frame
-                frame += 1
-
-        self.ani = FuncAnimation(fig, update, frames=frame_gen(), interval=200,cache_frame_data=False)
+            if self.paused:
+                return None
+            start = frame % self.t[-1]
+            t_window, low, high, t_marks, v_marks = pyramid.window(start, start + plot.window, plot.pixels)
+            plot.set_trace(signal, t_window, low, high, start)
+            plot.set_line(marks, t_marks, v_marks, start)
+            return start
+
+        plot = ScrollingPlot(fig, ax, update, interval=interval)
+        signal = plot.add_trace('r')
+        marks = plot.add_line('go')
+        plot.fit_y(self.v)
+        self.ani = plot
 
     def init_bar_chart(self, panel):
+        # Totales de todas las adquisiciones; init_bar_chart_two muestra los de una sola
+        self.bar_chart_totals = True
         self.fig, self.ax = plt.subplots()
         self.ax.set_title('Cantidad de fenomenos encontrados')
         self.ax.set_xlabel('Swell')
@@ -305,92 +352,183 @@ class MainWindow(Tk):
 
         self.canvas = FigureCanvasTkAgg(self.fig, master=panel)
         self.canvas.get_tk_widget().pack(fill=BOTH, expand=True)
-
         self.update_bar_chart()
     
 
     def update_bar_chart(self):
-        swell_count = self.count_swells()
+        # Eventos guardados de todas las adquisiciones, contados en la tabla eventos
+        counts = self.count_events()
 
         self.ax.clear()
-        self.ax.bar(['Swells'], [swell_count])
+        self.ax.bar([f'{tipo.capitalize()}s' for tipo in TIPOS], [counts.get(tipo, 0) for tipo in TIPOS])
         self.ax.set_title('Cantidad de fenomenos encontrados')
-        self.ax.set_xlabel('Swell')
+        self.ax.set_xlabel('Fenómeno')
         self.ax.set_ylabel('Cantidad')
         self.canvas.draw()
     
     
     def toggle_pause(self):
         self.paused = not self.paused
+        plot = getattr(self, 'ani', None)
         if self.paused:
-            self.ani.event_source.stop()
+            if plot is not None:
+                plot.event_source.stop()
+                # Tiempos de dibujo de la grafica hasta ahora, para ver si sostiene el intervalo
+                self.status_label.config(text=plot.timer.report())
             self.pause_button.config(text='play')
         else:
-            self.ani.event_source.start()
+            if plot is not None:
+                plot.event_source.start()
+            self.status_label.config(text='')
             self.pause_button.config(text='stop')
 
     
-    def count_swells(self):
-        datos = pd.read_csv('data/adc_datsa.csv', header=None, names=['tiempo', 'voltaje'])
-        datos = datos.astype(float)
-        t = datos['tiempo'].values
-        v = datos['voltaje'].values
-
-        def detect_ascent_peaks(voltage_series):
-            ascent_peaks = np.zeros_like(voltage_series, dtype=bool)
+    def refresh_bar_chart(self):
+        # Despues de guardar eventos: solo el grafico de totales depende de otras adquisiciones
+        if self.bar_chart_totals:
+            self.update_bar_chart()
 
-            for i in range(1, len(voltage_series) - 1):
-                if voltage_series[i - 1] < voltage_series[i] and voltage_series[i] > voltage_series[i + 1]:
-                    ascent_peaks[i] = True
+    def refresh_events(self):
+        # Recalcula en el pool los eventos que faltan o que invalidate_events borro al iniciar
+        version = self.pipeline.version
 
-            return ascent_peaks
-        ascent_peaks = detect_ascent_peaks(v)
-        
-        voltage_nominal = 220
-        lower_threshold = voltage_nominal * 1.1
-        upper_threshold = voltage_nominal * 1.8
-
-        labels = np.zeros_like(v)
-        labels[(v >= lower_threshold) & (v <= upper_threshold)] = 1
-
-        X = np.column_stack((v[:-1], v[1:]))
-        y = labels[1:]
-
-        model_path = 'Modelos_RandomForest/modelo_random_forest_swell.joblib'
-        model = load(model_path)
-        swell_detected = np.zeros_like(labels)
-        swell_detected[1:] = model.predict(X)
-        swell_detected = np.logical_and(swell_detected, ascent_peaks)
-        swell_count = np.count_nonzero(swell_detected)
-        return swell_count
+        def refresh(task):
+            connection = create_sqlite_connection()
+            if not connection:
+                raise RuntimeError("No se pudo conectar a la base de datos")
+            repository = almacenamiento.RecordingRepository(connection)
+            recording_ids = almacenamiento.stale_recordings(connection, version)
+            for index, recording_id in enumerate(recording_ids):
+                task.progress(index / len(recording_ids), 'Actualizando eventos')
+                recording = repository.get_recording(recording_id)
+                if recording is None or not len(recording.t):
+                    continue
+                order = np.argsort(recording.t)
+                detection = self.pipeline.compute(recording.t[order], recording.v[order], recording.tasa_muestreo)
+                almacenamiento.save_events(connection, recording_id, detection.events, tipos=TIPOS, version=version)
+            return len(recording_ids)
+
+        def done(count):
+            self.show_progress(1, '')
+            if count:
+                self.refresh_bar_chart()
+
+        self.tasks.submit(refresh, name='eventos', on_done=done, on_error=self.show_task_error,
+                          on_progress=self.show_progress)
+
+    def count_events(self):
+        connection = create_sqlite_connection()
+        return almacenamiento.count_events(connection) if connection else {}
     
     def toggle_pause(self):
         self.paused = not self.paused
+        plot = getattr(self, 'ani', None)
         if self.paused:
-            self.ani.event_source.stop()
+            if plot is not None:
+                plot.event_source.stop()
+                # Tiempos de dibujo de la grafica hasta ahora, para ver si sostiene el intervalo
+                self.status_label.config(text=plot.timer.report())
             self.pause_button.config(text='play')
         else:
-            self.ani.event_source.start()
+            if plot is not None:
+                plot.event_source.start()
+            self.status_label.config(text='')
             self.pause_button.config(text='stop')
 
     def start_acquisition(self):
-        acquisition_thread = threading.Thread(target=self.acquire_data)
-        acquisition_thread.start()
+        self.acquisition_thread = threading.Thread(target=self.acquire_data)
+        self.acquisition_thread.start()
 	
     def acquire_data(self):
         self.acquiring = True
-        filename = "adc_data.csv"
-        start_time = time.time()
-        while self.acquiring:
+        try:
+            adc = ADS1115(data_rate=self.data_rate)
+            adc.start()
+        except Exception as e:
+            # Este hilo no toca Tk: el mensaje se muestra desde el hilo de la interfaz
+            self.tasks.post(messagebox.showerror, "Error", f"Error al iniciar ADC: {e}")
+            self.acquiring = False
+            return
+        engine = AcquisitionEngine(adc)
+        session, self.resume_session = self.resume_session, None
+        try:
+            # La adquisicion se guarda en la base por bloques a medida que se captura (SessionWriter)
+            connection = create_sqlite_connection()
+            if session is not None:
+                # Reanuda una sesion interrumpida: mismos coeficientes y tiempos a continuacion
+                sequence, last_time = almacenamiento.session_tail(connection, session.id)
+                m, b = session.calibracion or (self.calibration.m, self.calibration.b)
+                time_offset = last_time + 1.0 / adc.data_rate if last_time is not None else 0.0
+                session_id = session.id
+            else:
+                sequence, time_offset = 0, 0.0
+                m, b = self.calibration.m, self.calibration.b
+                session_id = almacenamiento.open_session(connection, adc.data_rate, (m, b), self.calibration.id)
+        except Exception as e:
+            self.tasks.post(messagebox.showerror, "Error", f"Error al iniciar la sesión: {e}")
+            adc.close()
+            self.acquiring = False
+            return
+        finally:
+            # Este hilo no vuelve a usar la base (los bloques los guarda el SessionWriter): su conexion
+            # se cierra aqui, close_all() no puede cerrarla desde el hilo de la interfaz
+            basedatos.close_connection()
+        self.session_id = session_id
+        self.session_resumed = session is not None
+        # Clase de cada ventana de pocos ciclos (normal, swell, sag o armonico) durante la captura. Es
+        # opcional: el modelo fija los ciclos por ventana y no todas las tasas del ADC los contienen enteros
+        window_classifier, windows = self.window_classifier, None
+        if window_classifier is not None:
+            try:
+                windows = window_classifier.stream(adc.data_rate)
+                window_scale = window_classifier.scale(VOLTAGE_NOMINAL)
+            except ValueError as e:
+                windows = None
+                self.tasks.post(self.status_label.config, {'text': f"Sin clasificación en vivo: {e}"})
+        engine.start()
+        engine.start_time -= time_offset
+        # Cuentas -> voltios -> calibracion en una sola transformacion afin sobre cada bloque
+        gain = m * adc.scale
+        self.live_gain, self.live_offset = gain, b
+        # La grafica en vivo sigue self.engine: se publica cuando la ganancia ya esta lista
+        self.engine = engine
+        self.writer = SessionWriter(session_id, sequence=sequence).start()
+        # Los eventos se detectan durante la captura; la lista solo crece, la interfaz la lee al graficar
+        detector = OnlineDetector(adc.data_rate)
+        self.live_events = []
+        self.live_class = None
+        write_error = None
+        try:
+            while self.acquiring:
+                try:
+                    t_block, raw_block = self.engine.read_block()
+                    v_block = gain * raw_block + b
+                    try:
+                        # Espera si la base va atrasada; si el escritor fallo la adquisicion se detiene
+                        self.writer.put(np.column_stack((t_block, v_block)))
+                    except RuntimeError as e:
+                        write_error = e
+                        self.acquiring = False
+                        break
+                    self.live_events.extend(detector.push(t_block, v_block))
+                    if windows is not None:
+                        features, _ = windows.push(window_scale * v_block)
+                        if len(features):
+                            classes, _ = window_classifier.predict_features(features)
+                            self.live_class = CLASSES[classes[-1]]
+                except Exception as e:
+                    self.tasks.post(messagebox.showerror, "Error", f"Error al leer ADC: {e}")
+                    self.acquiring = False
+                    break
+        finally:
+            adc.close()
             try:
-                adc_value = read_adc()
-                elapsed_time = time.time() - start_time
-                write_to_csv(filename, [elapsed_time, adc_value])
-                time.sleep(0.1)
-            except Exception as e:
-                messagebox.showerror("Error", f"Error al leer ADC: {e}")
-                self.acquiring = False
-                break
+                self.writer.stop()
+            except RuntimeError as e:
+                write_error = e
+            if write_error is not None:
+                self.tasks.post(messagebox.showerror, "Error", f"Error al guardar la adquisición: {write_error}")
+            self.live_events.extend(detector.flush())
 
     def start_real_time_graph(self):
         self.clear_panel()
@@ -402,60 +540,127 @@ class MainWindow(Tk):
         self.t = []
         self.v = []
         self.paused = False
+        # Se copian solo las muestras nuevas del buffer de adquisicion; la ventana guarda los ultimos 10 s
+        reader = None
+
+        ax.set_xlabel('Tiempo en la ventana (s)')
+        ax.set_ylabel('Voltaje (AC)')
+        ax.set_title('Adquisición en Tiempo Real del ADC')
+        ax.grid(True)
 
         def update(frame):
-            if not self.paused:datos = pd.read_csv('adc_data.csv', header=None, names=['tiempo', 'voltaje'])
-            self.t = datos['tiempo'].values.astype(float)
-            self.v = datos['voltaje'].values.astype(float)
-
-            ax.clear()
-            xlim_start = self.t[-1] - 10 if self.t[-1] > 10 else 0
-            ax.set_xlim(xlim_start, self.t[-1])
-            ax.plot(self.t, self.v, 'r')
-
-            ax.set_xlabel('Tiempo (s)')
-            ax.set_ylabel('Voltaje (AC)')
-            ax.set_title('Adquisición en Tiempo Real del ADC')
-            ax.grid(True)
-            canvas.draw()
+            nonlocal reader
+            engine = getattr(self, 'engine', None)
+            if self.paused or engine is None:
+                return None
+            if reader is None or reader.source is not engine.buffer:
+                reader = BufferTail(engine.buffer, int(self.data_rate * 10), self.live_gain, self.live_offset)
+            reader.read()
+            self.t, self.v = reader.latest()
+            if len(self.t) == 0:
+                return None
+
+            xlim_start = self.t[-1] - plot.window if self.t[-1] > plot.window else 0
+            plot.fit_y(self.v)
+            plot.set_trace(signal, *envelope(self.t, self.v, plot.pixels), xlim_start)
+            events = [event for event in list(getattr(self, 'live_events', [])) if event.fin >= xlim_start]
+            plot.set_spans(spans, [event.inicio for event in events], [event.fin for event in events], xlim_start)
+            live_class = getattr(self, 'live_class', None)
+            window_class.set_text(f"Clase: {live_class}" if live_class else '')
+            return xlim_start
+
+        plot = ScrollingPlot(fig, ax, update)
+        signal = plot.add_trace('r')
+        spans = plot.add_area(color='yellow', alpha=0.5)
+        window_class = plot.add(ax.text(0.99, 0.98, '', transform=ax.transAxes, ha='right', va='top'))
+        self.ani = plot
 
-    
     def star_real_time(self):
-        graph_thread = threading.Thread(target=self.start_real_time_graph)
-        graph_thread.start()
+        # La figura se crea en el hilo de Tk; la lectura del archivo por cuadro es incremental
+        self.start_real_time_graph()
 
     def stop_acquisition(self):
         self.acquiring = False
-        self.procesar_y_guardar()
-        self.clear_panel_two()
-        self.init_table(self.panel2)
+        acquisition_thread = getattr(self, 'acquisition_thread', None)
+        self.acquisition_thread = None
+
+        def save(task):
+            if acquisition_thread is not None:
+                acquisition_thread.join()
+            task.progress(0.5, 'Guardando adquisición')
+            return self.procesar_y_guardar()
+
+        def done(recording_id):
+            self.show_progress(1, '')
+            if recording_id is not None and self.table_exhausted:
+                self.append_recording_row(recording_id)
+            # Los eventos en vivo ya estan guardados; los de una sesion reanudada se calculan ahora
+            if recording_id is not None:
+                self.refresh_bar_chart()
+                if self.session_resumed:
+                    self.refresh_events()
+
+        self.tasks.submit(save, name='guardar', on_done=done, on_error=self.show_task_error,
+                          on_progress=self.show_progress)
+
+    def append_recording_row(self, recording_id):
+        connection = create_sqlite_connection()
+        if connection:
+            recording = almacenamiento.RecordingRepository(connection).get_metadata(recording_id)
+            if recording is not None:
+                self.insert_table_row(recording.id, recording.fecha_guardado, recording.duracion, recording.num_muestras)
+                self.last_loaded_id = recording.id
     
     def procesar_y_guardar(self):
-        sensor_values = np.array([0.275, 0.418, 0.425, 0.426, 0.427, 0.428, 0.696])
-        real_values = np.array([129.1, 193.3, 196.2, 196.5, 196.6, 197.0, 220.0])
-        coefficients = np.polyfit(sensor_values, real_values, 1)
-        m, b = coefficients
-        datos_convertidos = []
-        
-        with open('adc_data.csv', 'r') as file:
-            reader = csv.reader(file)
-            for row in reader:
-                # Verifica que la fila tenga exactamente 2 elementos
-                if len(row) == 2:
-                    tiempo, voltage_adc = map(float, row)
-                    voltage_real = (m * voltage_adc + b)-120
-                    datos_convertidos.append([tiempo, voltage_real])
-                else:
-                    print(f"Fila ignorada debido a un número incorrecto de elementos: {row}")
-
-        with open('adc_data.csv', 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerows(datos_convertidos)
-        
-        save_csv_to_db('adc_data.csv')
-
+        # Los bloques ya estan en la base: solo se convierte la sesion en una adquisicion
+        session_id, self.session_id = self.session_id, None
+        if session_id is None:
+            return
+        connection = create_sqlite_connection()
+        if connection:
+            recording_id = almacenamiento.finalize_session(connection, session_id)
+            # De una sesion reanudada solo se detecto la ultima parte; sus eventos los calcula refresh_events
+            if recording_id is not None and not self.session_resumed:
+                almacenamiento.save_events(connection, recording_id, getattr(self, 'live_events', []), tipos=TIPOS,
+                                           version=self.pipeline.version)
+            return recording_id
+
+    def recover_sessions(self):
+        # Sesiones abiertas por un cierre inesperado: la ultima se puede reanudar, el resto se guarda
+        connection = create_sqlite_connection()
+        sessions = [session for session in almacenamiento.open_sessions(connection)
+                    if session.id != self.session_id] if connection else []
+        if not sessions:
+            return
+        latest = sessions[-1]
+        if latest.num_muestras and messagebox.askyesno(
+                "Adquisición interrumpida",
+                f"La adquisición iniciada el {latest.fecha_inicio} ({latest.num_muestras} muestras) no se "
+                "finalizó.\n¿Reanudarla en la próxima adquisición? (No: guardarla ahora)"):
+            self.resume_session = latest
+            sessions = sessions[:-1]
+
+        def finalize(task):
+            recording_ids = []
+            for index, session in enumerate(sessions):
+                task.progress(index / len(sessions), 'Guardando adquisiciones interrumpidas')
+                recording_ids.append(almacenamiento.finalize_session(create_sqlite_connection(), session.id))
+            return recording_ids
+
+        def done(recording_ids):
+            self.show_progress(1, '')
+            if self.table_exhausted:
+                for recording_id in recording_ids:
+                    if recording_id is not None:
+                        self.append_recording_row(recording_id)
+            self.refresh_events()
+
+        if sessions:
+            self.tasks.submit(finalize, name='recuperar', on_done=done, on_error=self.show_task_error,
+                              on_progress=self.show_progress)
 
     def clear_panel(self):
+        self.stop_animation()
         for widget in self.panel3.winfo_children():
             widget.destroy()
     
@@ -469,6 +674,7 @@ class MainWindow(Tk):
     
 
     def clear_panel(self):
+        self.stop_animation()
         for widget in self.panel3.winfo_children():
             widget.destroy()
     
@@ -481,6 +687,7 @@ class MainWindow(Tk):
             widget.destroy()
 
     def init_bar_chart_two(self, panel):
+        self.bar_chart_totals = False
         self.fig, self.ax = plt.subplots()
         self.ax.set_title('Cantidad de fenomenos encontrados')
         self.ax.set_xlabel('Swell')
@@ -502,97 +709,51 @@ class MainWindow(Tk):
     
 
     def visualizar_datos(self):
-        if not hasattr(self, 'selected_csv'):
-            messagebox.showerror("Error", "Seleccione un archivo CSV en la tabla primero.")
+        if not hasattr(self, 'selected_id'):
+            messagebox.showerror("Error", "Seleccione una adquisición en la tabla primero.")
             return
+        # Solo interesa la ultima adquisicion pedida
+        if self.visualization_task is not None:
+            self.visualization_task.cancel()
+        self.visualization_task = self.tasks.submit(self.load_recording, self.selected_id, name='visualizar',
+                                                    on_done=self.show_recording, on_error=self.show_task_error,
+                                                    on_progress=self.show_progress)
+
+    def load_recording(self, task, recording_id):
+        # Corre en el pool: no toca widgets
+        connection = create_sqlite_connection()
+        if not connection:
+            raise RuntimeError("No se pudo conectar a la base de datos")
+        task.progress(0.0, 'Leyendo adquisición')
+        recording = almacenamiento.RecordingRepository(connection).get_recording(recording_id)
+        if recording is None or not len(recording.t):
+            raise LookupError("No se encontró la adquisición seleccionada.")
+        t, v = recording.t, recording.v
+        sorted_indices = np.argsort(t)
+        t = t[sorted_indices]
+        v = v[sorted_indices]
+
+        task.progress(0.4, 'Detectando fenómenos')
+        detection = self.pipeline.run(t, v, key=('adquisicion', recording_id), rate=recording.tasa_muestreo)
+        # Los eventos guardados se reemplazan si no se calcularon con la deteccion actual
+        version = self.pipeline.version
+        if almacenamiento.events_version(connection, recording_id) != version:
+            task.progress(0.9, 'Guardando eventos')
+            almacenamiento.save_events(connection, recording_id, detection.events, tipos=TIPOS, version=version)
+        counts = almacenamiento.count_events(connection, recording_id)
+        return t, v, detection.swell_detected, counts.get('swell', 0)
+
+    def show_recording(self, result):
+        t, v, swell_detected, swell_count = result
+        self.visualization_task = None
+        self.show_progress(1, '')
         self.clear_panel()
+        self.swell_count = swell_count
+        self.clear_panel_four()
+        self.init_bar_chart_two(self.panel4)
+        self.update_bar_chart_two(self.swell_count)
 
-        connection = create_sqlite_connection()
-        if connection:
-            cursor = connection.cursor()
-            cursor.execute("SELECT archivo_csv FROM adquisiciones WHERE archivo_csv = ?", (self.selected_csv,))
-            result = cursor.fetchone()
-            cursor.close()
-            connection.close()
-
-            if result:
-                csv_data = result[0]
-                csv_buffer = io.StringIO(csv_data)
-                datos = pd.read_csv(csv_buffer, header=None, names=['tiempo', 'voltaje'])
-                datos['tiempo'] = datos['tiempo']
-                datos['voltaje'] = datos['voltaje']
-                
-                t = datos['tiempo'].values.astype(float)
-                v = datos['voltaje'].values.astype(float) 
-
-                sorted_indices = np.argsort(t)
-                t = t[sorted_indices]
-                v = v[sorted_indices]
-
-                def detect_ascent_peaks(voltage_series):
-                    ascent_peaks = np.zeros_like(voltage_series, dtype=bool)
-                    for i in range(1, len(voltage_series) - 1):
-                        if voltage_series[i - 1] < voltage_series[i] and voltage_series[i] > voltage_series[i + 1]:
-                            ascent_peaks[i] = True
-                    return ascent_peaks
-                ascent_peaks = detect_ascent_peaks(v)
-
-                voltage_nominal = 220
-                lower_threshold = voltage_nominal * 1.1
-                upper_threshold = voltage_nominal * 1.8
-
-                labels = np.zeros_like(v)
-                labels[(v >= lower_threshold) & (v <= upper_threshold)] = 1
-
-                X = np.column_stack((v[:-1], v[1:]))
-                y = labels[1:]
-
-                model_path = 'Modelos_RandomForest/modelo_random_forest_swell.joblib'
-                model = load(model_path)
-                swell_detected = np.zeros_like(labels)
-                swell_detected[1:] = model.predict(X)
-                swell_detected = np.logical_and(swell_detected, ascent_peaks)
-                self.swell_count = np.count_nonzero(swell_detected)
-                self.clear_panel_four()
-                self.init_bar_chart_two(self.panel4)
-                self.update_bar_chart_two(self.swell_count)
-
-                fig, ax = plt.subplots()
-                canvas = FigureCanvasTkAgg(fig, master=self.panel3)
-                canvas.get_tk_widget().pack(fill=BOTH, expand=True)
-                self.paused = False
-                self.t = t
-                self.v = v
-                self.swell_detected = swell_detected
-
-                def update(frame):
-                    if not self.paused:
-                        ax.clear()
-                        xlim_start = frame % self.t[-1]
-                        xlim_end = (frame + 10) % self.t[-1]
-                        if xlim_end < xlim_start:
-                            xlim_end += self.t[-1]
-
-                        ax.set_xlim(xlim_start, xlim_end)
-                        ax.plot(self.t, self.v, 'r')
-
-                        swell_mask = (self.t >= xlim_start) & (self.t <= xlim_end)
-                        detected_mask = np.logical_and(self.swell_detected, swell_mask)
-                        ax.plot(self.t[detected_mask], self.v[detected_mask], 'go')
-                        ax.set_xlabel('Tiempo (s)')
-                        ax.set_ylabel('Voltaje (AC)')
-                        ax.set_title('Voltaje vs Tiempo')
-                        ax.grid(True)
-
-                def frame_gen():
-                    frame = 0
-                    while True:
-                        yield frame
-                        frame += 1
-
-                self.ani = FuncAnimation(fig, update, frames=frame_gen(), interval=100, cache_frame_data=False)
-            else:
-                messagebox.showerror("Error", "No se encontró el archivo CSV seleccionado.")
+        self.animate_recording(self.panel3, t, v, swell_detected, 'Voltaje (AC)', 'Voltaje vs Tiempo')
 
     def on_closing(self):
         if messagebox.askokcancel("Salir", "¿Realmente quieres salir?"):
@@ -601,7 +762,16 @@ class MainWindow(Tk):
             os._exit(os.EX_OK)
 
     def cleanup(self):
-	    self.acquisition_running = False
+	    # Detiene la adquisicion y espera a que el ultimo bloque quede en la base; la sesion se
+	    # finaliza ahora o, si el cierre la interrumpe, se recupera al volver a abrir el programa
+	    self.acquiring = False
+	    acquisition_thread, self.acquisition_thread = getattr(self, 'acquisition_thread', None), None
+	    if acquisition_thread is not None:
+	        acquisition_thread.join()
+	        self.procesar_y_guardar()
+	    self.stop_animation()
+	    self.tasks.shutdown()
+	    basedatos.close_all()
         
 
 if __name__ == '__main__':
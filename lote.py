@@ -0,0 +1,147 @@
+#Analisis por lotes sin interfaz: corre la deteccion sobre todas las adquisiciones de la base
+#o sobre un directorio de CSV, en paralelo, y escribe un resumen de eventos por adquisicion
+#Uso: python lote.py [--db registros.db | --csv DIRECTORIO] [--procesos N] [--salida resumen.csv] [--guardar]
+import argparse
+import csv
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import almacenamiento
+import eventos
+import rms as urms
+from basedatos import DB_PATH, create_sqlite_connection
+from deteccion import DetectionPipeline, event_gap
+
+TIPOS = ('swell', 'sag')
+
+# Un pipeline por proceso; sin cache porque cada adquisicion se analiza una sola vez
+_pipeline = None
+
+
+def _get_pipeline():
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = DetectionPipeline(cache_size=0)
+    return _pipeline
+
+
+def recording_sources(db_path):
+    # Ids de todas las adquisiciones, recorriendo la tabla por paginas
+    connection = create_sqlite_connection(db_path)
+    # Una base anterior al formato por bloques se migra primero, igual que al abrir la interfaz
+    almacenamiento.migrate(connection)
+    last_id = None
+    while True:
+        rows = almacenamiento.list_recordings(connection, last_id, limit=500)
+        for row in rows:
+            yield ('db', db_path, row[0])
+        if len(rows) < 500:
+            return
+        last_id = rows[-1][0]
+
+
+def csv_sources(directory):
+    for path in sorted(glob.glob(os.path.join(directory, '*.csv'))):
+        yield ('csv', path, None)
+
+
+def load(source):
+    kind, path, recording_id = source
+    if kind == 'db':
+        recording = almacenamiento.RecordingRepository(create_sqlite_connection(path)).get_recording(recording_id)
+        if recording is None:
+            raise LookupError(f"No existe la adquisicion {recording_id}")
+        t, v, rate = recording.t, recording.v, recording.tasa_muestreo
+    else:
+        datos = pd.read_csv(path, header=None, names=['tiempo', 'voltaje']).astype(float)
+        t, v, rate = datos['tiempo'].values, datos['voltaje'].values, None
+    order = np.argsort(t, kind='stable')
+    return t[order], v[order], rate
+
+
+def analyze(source):
+    """Corre en un proceso del pool: detecta swells (bosque) y sags (Urms(1/2)) de una adquisicion.
+
+    Devuelve (origen, num_muestras, duracion, eventos, error); los errores se devuelven en lugar
+    de lanzarse para que una adquisicion danada no detenga el lote. Las adquisiciones muestreadas
+    por debajo de dos veces la frecuencia de red se rechazan: no alcanzan para el Urms(1/2).
+    """
+    try:
+        t, v, rate = load(source)
+        pipeline = _get_pipeline()
+        rate = rate or almacenamiento.estimate_sample_rate(t) or 1.0
+        if rate < 2 * urms.FREQUENCY:
+            # Con menos de dos muestras por ciclo el Urms(1/2) seria el valor de una sola muestra
+            raise ValueError(f"tasa de muestreo de {rate:.1f} muestras/s, Urms(1/2) requiere al menos "
+                             f"{2 * urms.FREQUENCY} muestras/s")
+        detection = pipeline.compute(t, v, rate)
+        _, sag = urms.classify(detection.rms, pipeline.voltage_nominal)
+        events = detection.events + eventos.segment(sag, t, detection.rms, 'sag', event_gap(rate), 1.0 / rate)
+        duration = float(t[-1] - t[0]) if len(t) > 1 else 0.0
+        return source, len(t), duration, events, None
+    except Exception as e:
+        return source, 0, 0.0, [], f"{type(e).__name__}: {e}"
+
+
+def summary_row(result):
+    (kind, path, recording_id), num_muestras, duracion, events, error = result
+    row = {'adquisicion': recording_id if kind == 'db' else os.path.basename(path),
+           'muestras': num_muestras, 'duracion': round(duracion, 3)}
+    for tipo in TIPOS:
+        selected = [event for event in events if event.tipo == tipo]
+        row[f'eventos_{tipo}'] = len(selected)
+        row[f'duracion_{tipo}'] = round(sum(event.duracion for event in selected), 3)
+    row['error'] = error or ''
+    return row
+
+
+def run(sources, output, workers=None, save=False):
+    sources = list(sources)
+    fields = ['adquisicion', 'muestras', 'duracion'] + [f'{kind}_{tipo}' for tipo in TIPOS
+                                                        for kind in ('eventos', 'duracion')] + ['error']
+    start = time.perf_counter()
+    failed = 0
+    version = DetectionPipeline(cache_size=0).version
+    # 'spawn': los procesos no heredan la conexion SQLite abierta al listar las adquisiciones
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    with pool, open(output, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        # map conserva el orden de las adquisiciones; cada fila se escribe apenas esta lista
+        for index, result in enumerate(pool.map(analyze, sources), start=1):
+            row = summary_row(result)
+            writer.writerow(row)
+            failed += bool(row['error'])
+            # Las escrituras a la base se hacen solo desde este proceso
+            (kind, path, recording_id), _, _, events, error = result
+            if save and kind == 'db' and error is None:
+                almacenamiento.save_events(create_sqlite_connection(path), recording_id, events, tipos=TIPOS,
+                                           version=version)
+            print(f"[{index}/{len(sources)}] {row['adquisicion']}: "
+                  + (row['error'] or ", ".join(f"{row[f'eventos_{tipo}']} {tipo}" for tipo in TIPOS)))
+    print(f"{len(sources)} adquisiciones en {time.perf_counter() - start:.1f} s ({failed} con error); "
+          f"resumen en {output}")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deteccion por lotes sobre adquisiciones guardadas")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--db', default=DB_PATH, help="base SQLite con las adquisiciones (por defecto %(default)s)")
+    source.add_argument('--csv', metavar='DIRECTORIO', help="directorio con archivos tiempo,voltaje")
+    parser.add_argument('--procesos', type=int, default=None, help="procesos del pool (por defecto, uno por nucleo)")
+    parser.add_argument('--salida', default='resumen.csv', help="tabla resumen (por defecto %(default)s)")
+    parser.add_argument('--guardar', action='store_true', help="guardar los eventos detectados en la base")
+    args = parser.parse_args(argv)
+
+    sources = csv_sources(args.csv) if args.csv else recording_sources(args.db)
+    return run(sources, args.salida, args.procesos, args.guardar)
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main() else 0)
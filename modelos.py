@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+from joblib import load
+from bosque import FlatForest
+
+
+class ModelRegistry:
+    """Carga cada modelo .joblib una sola vez y lo mantiene en memoria.
+
+    En cada get() solo se consulta la fecha de modificacion del archivo; si cambio (p. ej. por
+    un reentrenamiento) el modelo se vuelve a cargar. Con mmap_mode='r' joblib mapea los
+    arreglos grandes del archivo en lugar de copiarlos a memoria.
+    """
+
+    def __init__(self, mmap_mode=None):
+        self.mmap_mode = mmap_mode
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        key = os.path.abspath(path)
+        mtime = os.stat(key).st_mtime_ns
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None or entry['mtime'] != mtime:
+                start = time.perf_counter()
+                model = load(key, mmap_mode=self.mmap_mode)
+                entry = {
+                    'model': model,
+                    'mtime': mtime,
+                    'load_time': time.perf_counter() - start,
+                    'memory': model_memory(model),
+                    'loads': (entry['loads'] + 1) if entry else 1,
+                }
+                self._models[key] = entry
+            return entry['model']
+
+    def get_compiled(self, path):
+        # Version en arreglos planos (bosque.FlatForest) del modelo, compilada una vez por carga
+        model = self.get(path)
+        with self._lock:
+            entry = self._models[os.path.abspath(path)]
+            if entry.get('compiled') is None or entry['model'] is not model:
+                entry['compiled'] = FlatForest.from_sklearn(model)
+            return entry['compiled']
+
+    def info(self, path):
+        entry = self._models.get(os.path.abspath(path))
+        if entry is None:
+            return None
+        return {k: entry[k] for k in ('load_time', 'memory', 'loads')}
+
+    def report(self):
+        lines = []
+        for path, entry in self._models.items():
+            lines.append(f"{os.path.basename(path)}: carga {entry['load_time'] * 1000:.1f} ms, "
+                         f"{entry['memory'] / 1024:.1f} KiB, {entry['loads']} carga(s)")
+        return "\n".join(lines)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+def model_memory(model):
+    # Bytes que ocupan los arreglos de los arboles (nodos y valores de las hojas)
+    total = 0
+    for estimator in getattr(model, 'estimators_', [model]):
+        tree = getattr(estimator, 'tree_', None)
+        if tree is None:
+            continue
+        state = tree.__getstate__()
+        total += state['nodes'].nbytes + state['values'].nbytes
+    return total
+
+
+registry = ModelRegistry()
+
+
+def get_model(path):
+    return registry.get(path)
+
+
+def get_compiled_model(path):
+    return registry.get_compiled(path)
@@ -1,78 +1,53 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 import pandas as pd
-from joblib import load
+from grafica import ScrollingPlot, visible
+from modelos import registry
+from clasificacion import DisturbanceClassifier, synthetic_signal
 
-# Cargar los modelos entrenados
-model_swell = load('Modelos_RandomForest/modelo_random_forest_swell.joblib')
-model_sag = load('Modelos_RandomForest/modelo_random_forest_sag.joblib')
-model_armonico = load('Modelos_RandomForest/modelo_random_forest_arm.joblib')
+# Cargar el modelo multiclase (swell, sag y armonico en un solo bosque)
+classifier = DisturbanceClassifier.load()
+print(registry.report())
 
-# Generar la señal de tiempo y voltaje
-t = np.linspace(0, 10, 10000)
-v = np.sin(2 * np.pi * 60 * t) + 0.5 * np.sin(2 * np.pi * 180 * t)
+# Señal de prueba con swell, sags y armónico; la misma con la que se entrena el clasificador
+t, v, v_combined, _ = synthetic_signal()
 
-# Introducir fenómenos en la señal
-v_combined = v.copy()
-v_combined[5000:6000] = v[5000:6000] * 1.1  # Swell
-v_combined[2000:2500] = v[2000:2500] * 0.4  # Sag
-v_combined[5000:5500] = v[5000:5500] * 0.9  # Sag
-
-# Parámetros para el armónico
-A_1 = 1  # Amplitud
-a_1 = 0  # Fase
-omega = np.sqrt(2)  # Frecuencia angular
-x = np.linspace(0, 2*np.pi, 2000)
-y1 = np.sqrt(2) * A_1 * np.sin(9*x + 9*(a_1))
-
-v_combined[6000:8000] = y1  # Armónico
+fig, ax = plt.subplots()
+ax.set_xlabel('Tiempo en la ventana (s)')
+ax.set_ylabel('Voltaje')
 
 # Función para actualizar y visualizar la señal en tiempo real
 def update(frame):
-    ax.clear()
-    xlim_start = frame % 10  
-    xlim_end = (frame + 0.04) % 10
-    if xlim_end < xlim_start: 
-        xlim_end += 10
+    xlim_start = (frame * 0.09) % 10
+    window = visible(t, xlim_start, xlim_start + plot.window)
+    t_window, v_window, combined_window = t[window], v[window], v_combined[window]
 
-    ax.set_xlim(xlim_start, xlim_end)
-    ax.plot(t, v, 'r')
-    ax.plot(t, v_combined, 'k')
-
-    mask = (t >= xlim_start) & (t <= xlim_end)
-    ax.fill_between(t[mask], v[mask], v_combined[mask], color='yellow', alpha=0.5)
+    plot.set_line(signal, t_window, v_window, xlim_start)
+    plot.set_line(combined, t_window, combined_window, xlim_start)
+    plot.set_fill(area, t_window, v_window, combined_window, xlim_start)
 
     # Usar los modelos para detectar fenómenos
-    X = np.column_stack((v[mask], v_combined[mask]))  # Solo se incluyen los valores de voltaje relevantes
-    
-    # Detección de swell
-    swell_detected = model_swell.predict(X) == 1
-    ax.plot(t[mask][swell_detected], v_combined[mask][swell_detected], 'g*', label='Swell detectado')
-    
-    # Detección de sag
-    sag_detected = model_sag.predict(X) == 1
-    ax.plot(t[mask][sag_detected], v_combined[mask][sag_detected], 'b*', label='Sag detectado')
-    
-    # Detección de armónicos
-    arm_detected = model_armonico.predict(X) == 1
-    ax.plot(t[mask][arm_detected], v_combined[mask][arm_detected], 'm*', label='Armónico detectado')
-
-    ax.set_xlabel('Tiempo (s)')
-    ax.set_ylabel('Voltaje')
-    ax.legend()
-
-fig, ax = plt.subplots()
-
-# Generador de frames para la animación
-def frame_gen():
-    frame = 0
-    while True:
-        yield frame
-        frame += 0.09
-
-# Configuración de la animación
-ani = FuncAnimation(fig, update, frames=frame_gen(), interval=50)
+    X = np.column_stack((v_window, combined_window))  # Solo se incluyen los valores de voltaje relevantes
+
+    # Una sola pasada del bosque para los tres fenómenos
+    labels, proba, detected = classifier.detect(X)
+    for name, line in markers.items():
+        plot.set_line(line, t_window[detected[name]], combined_window[detected[name]], xlim_start)
+    return xlim_start
+
+# Las lineas se crean una sola vez; cada cuadro solo recibe la porcion visible
+plot = ScrollingPlot(fig, ax, update, window=0.04, interval=50)
+signal = plot.add_line('r')
+combined = plot.add_line('k')
+area = plot.add_area(color='yellow', alpha=0.5)
+markers = {
+    'swell': plot.add_line('g*', label='Swell detectado'),
+    'sag': plot.add_line('b*', label='Sag detectado'),
+    'armonico': plot.add_line('m*', label='Armónico detectado'),
+}
+plot.fit_y(np.concatenate((v, v_combined)))
+ax.legend()
 
 # Visualización
-plt.show()
\ No newline at end of file
+plt.show()
+print(plot.timer.report())
@@ -1,12 +1,5 @@
-import sqlite3
+from basedatos import create_sqlite_connection
 
-def create_sqlite_connection():
-    try:
-        connection = sqlite3.connect('registros.db')
-        return connection
-    except sqlite3.Error as e:
-        print(f"Error: {e}")
-    return None
 
 def print_table_contents():
     connection = create_sqlite_connection()
@@ -19,6 +12,5 @@ def print_table_contents():
             print(row)
         
         cursor.close()
-        connection.close()
 
 print(print_table_contents())
\ No newline at end of file
@@ -0,0 +1,75 @@
+import numpy as np
+
+FREQUENCY = 60
+SWELL_THRESHOLD = 1.1
+SAG_THRESHOLD = 0.9
+
+
+def cycle_length(sample_rate, frequency=FREQUENCY):
+    # Muestras por ciclo; al menos una para senales muestreadas por debajo de la frecuencia de red
+    return max(int(round(sample_rate / frequency)), 1)
+
+
+def half_cycle_rms(v, sample_rate, frequency=FREQUENCY):
+    """Urms(1/2) de IEC 61000-4-30: RMS sobre un ciclo, actualizado cada medio ciclo.
+
+    Usa la suma acumulada de v**2, asi cada valor cuesta O(1) sin importar el largo de la
+    ventana. Devuelve (valores RMS, indice de la muestra siguiente al final de cada ventana).
+    """
+    v = np.asarray(v, dtype=np.float64)
+    window = cycle_length(sample_rate, frequency)
+    hop = max(window // 2, 1)
+    if len(v) < window:
+        return np.empty(0), np.empty(0, dtype=np.intp)
+    squares = np.concatenate(([0.0], np.cumsum(v * v)))
+    ends = np.arange(window, len(v) + 1, hop)
+    return np.sqrt(np.maximum(squares[ends] - squares[ends - window], 0) / window), ends
+
+
+def rms_per_sample(v, sample_rate, frequency=FREQUENCY):
+    # Asigna a cada muestra el ultimo Urms(1/2) disponible (las primeras reciben el primero)
+    values, ends = half_cycle_rms(v, sample_rate, frequency)
+    per_sample = np.zeros(len(v))
+    if len(values):
+        index = np.searchsorted(ends, np.arange(1, len(v) + 1), side='right') - 1
+        per_sample = values[np.maximum(index, 0)]
+    return per_sample
+
+
+def classify(rms, nominal, swell_threshold=SWELL_THRESHOLD, sag_threshold=SAG_THRESHOLD):
+    # Mascaras de swell y sag segun los umbrales relativos a la tension declarada
+    return rms > swell_threshold * nominal, rms < sag_threshold * nominal
+
+
+class SlidingRms:
+    """Urms(1/2) sobre una senal que llega por bloques.
+
+    Entre bloques solo se guardan las sumas acumuladas de v**2 del ultimo ciclo; cada bloque
+    continua esa suma, O(1) por muestra nueva. Como np.cumsum suma en orden, los valores son
+    identicos (bit a bit) a los de half_cycle_rms sobre la senal completa, sin importar como
+    se corten los bloques. Los indices devueltos son absolutos desde el inicio del flujo.
+    """
+
+    def __init__(self, sample_rate, frequency=FREQUENCY):
+        self.window = cycle_length(sample_rate, frequency)
+        self.hop = max(self.window // 2, 1)
+        # Suma de v**2 de las muestras [0, i) para i en [_count - window, _count]
+        self._cumulative = np.zeros(1)
+        self._count = 0
+        self._next_end = self.window
+
+    def push(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float64)
+        cumulative = np.concatenate((self._cumulative[:-1],
+                                     np.cumsum(np.concatenate((self._cumulative[-1:], chunk * chunk)))))
+        start = self._count - (len(self._cumulative) - 1)
+        self._count += len(chunk)
+        ends = np.arange(self._next_end, self._count + 1, self.hop)
+        if len(ends):
+            local = ends - start
+            values = np.sqrt(np.maximum(cumulative[local] - cumulative[local - self.window], 0) / self.window)
+            self._next_end = ends[-1] + self.hop
+        else:
+            values = np.empty(0)
+        self._cumulative = cumulative[-(self.window + 1):]
+        return values, ends
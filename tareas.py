@@ -0,0 +1,109 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_INTERVAL = 50
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class Task:
+    """Trabajo enviado a un TaskExecutor.
+
+    La funcion recibe la tarea como primer argumento: llama a progress() para informar avance
+    y a check() entre pasos para terminar antes si la tarea fue cancelada.
+    """
+
+    def __init__(self, executor, name, on_progress):
+        self.executor = executor
+        self.name = name
+        self.future = None
+        self._cancelled = threading.Event()
+        self._on_progress = on_progress
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise TaskCancelled(self.name)
+
+    def progress(self, fraction, message=''):
+        self.check()
+        if self._on_progress is not None:
+            self.executor.post(self._on_progress, fraction, message)
+
+
+class TaskExecutor:
+    """Pool de hilos para el trabajo pesado de una interfaz Tk.
+
+    Las funciones corren en el pool; sus resultados, errores y avances vuelven al hilo de Tk
+    por una cola que se vacia con after(), asi los callbacks son el unico codigo que toca
+    widgets. post() permite lo mismo desde cualquier otro hilo (p. ej. el de adquisicion).
+    Se usan hilos y no procesos: el trabajo es NumPy, scikit-learn y SQLite, que liberan el
+    GIL, y las conexiones y caches del proceso se comparten sin serializar nada.
+    """
+
+    def __init__(self, root, workers=2, poll_interval=POLL_INTERVAL):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix='tarea')
+        self.tasks = set()
+        self._calls = queue.SimpleQueue()
+        self._after_id = self.root.after(poll_interval, self._poll)
+
+    def submit(self, function, *args, name=None, on_done=None, on_error=None, on_progress=None, **kwargs):
+        task = Task(self, name or function.__name__, on_progress)
+        self.tasks.add(task)
+        task.future = self.pool.submit(function, task, *args, **kwargs)
+        task.future.add_done_callback(lambda future: self.post(self._finish, task, on_done, on_error))
+        return task
+
+    def post(self, callback, *args):
+        # Seguro desde cualquier hilo: el callback corre en el hilo de Tk en el siguiente sondeo
+        self._calls.put((callback, args))
+
+    def cancel_all(self):
+        for task in list(self.tasks):
+            task.cancel()
+
+    def shutdown(self, wait=False):
+        self.cancel_all()
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self.pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _finish(self, task, on_done, on_error):
+        self.tasks.discard(task)
+        if task.future.cancelled() or task.cancelled:
+            return
+        error = task.future.exception()
+        if isinstance(error, TaskCancelled):
+            return
+        if error is not None:
+            if on_error is None:
+                raise error
+            on_error(error)
+        elif on_done is not None:
+            on_done(task.future.result())
+
+    def _poll(self):
+        try:
+            while True:
+                callback, args = self._calls.get_nowait()
+                try:
+                    callback(*args)
+                except Exception as e:
+                    self.root.report_callback_exception(type(e), e, e.__traceback__)
+        except queue.Empty:
+            pass
+        self._after_id = self.root.after(self.poll_interval, self._poll)